@@ -1,109 +1,176 @@
-from flask import Flask, request, render_template
-from fetch_nba_data import save_all_nba_data, fetch_last_3_games_stats
-from fetch_tweets import save_tweets
-from predict_winner import predict_winner
-import pandas as pd
+from flask import Flask, Response, request, render_template, jsonify, stream_with_context
+from data_refresher import DataRefresher
+from team_index import NBA_TEAMS as nba_teams
+from metrics import metrics, instrument_app
+from config import configure
 import os
+import sys
+import json
 import time
 import logging
-
-os.environ['NBA_API_SSL_VERIFY'] = 'false'
+import threading
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-app = Flask(__name__)
-
-# List of NBA teams and abbreviation mapping
-nba_teams = [
-    "Atlanta Hawks", "Boston Celtics", "Brooklyn Nets", "Charlotte Hornets", "Chicago Bulls",
-    "Cleveland Cavaliers", "Dallas Mavericks", "Denver Nuggets", "Detroit Pistons", "Golden State Warriors",
-    "Houston Rockets", "Indiana Pacers", "Los Angeles Clippers", "Los Angeles Lakers", "Memphis Grizzlies",
-    "Miami Heat", "Milwaukee Bucks", "Minnesota Timberwolves", "New Orleans Pelicans", "New York Knicks",
-    "Oklahoma City Thunder", "Orlando Magic", "Philadelphia 76ers", "Phoenix Suns", "Portland Trail Blazers",
-    "Sacramento Kings", "San Antonio Spurs", "Toronto Raptors", "Utah Jazz", "Washington Wizards"
-]
-
-team_abbreviation_map = {
-    "ATL": "Atlanta Hawks", "BOS": "Boston Celtics", "BKN": "Brooklyn Nets", "CHA": "Charlotte Hornets",
-    "CHI": "Chicago Bulls", "CLE": "Cleveland Cavaliers", "DAL": "Dallas Mavericks", "DEN": "Denver Nuggets",
-    "DET": "Detroit Pistons", "GSW": "Golden State Warriors", "HOU": "Houston Rockets", "IND": "Indiana Pacers",
-    "LAC": "Los Angeles Clippers", "LAL": "Los Angeles Lakers", "MEM": "Memphis Grizzlies", "MIA": "Miami Heat",
-    "MIL": "Milwaukee Bucks", "MIN": "Minnesota Timberwolves", "NOP": "New Orleans Pelicans", "NYK": "New York Knicks",
-    "OKC": "Oklahoma City Thunder", "ORL": "Orlando Magic", "PHI": "Philadelphia 76ers", "PHX": "Phoenix Suns",
-    "POR": "Portland Trail Blazers", "SAC": "Sacramento Kings", "SAS": "San Antonio Spurs", "TOR": "Toronto Raptors",
-    "UTA": "Utah Jazz", "WAS": "Washington Wizards"
-}
-
-# Check if data is older than 24 hours
-def should_fetch_data():
-    if not os.path.exists('last_fetched.txt'):
-        return True
-    with open('last_fetched.txt', 'r') as f:
-        content = f.read().strip()
-        if not content:
-            return True
+# The data layer (pandas, nba_api, BeautifulSoup) and the API clients are imported
+# and built on the first request that needs them. Set PRELOAD_DATA=true to load
+# them in create_app() instead, e.g. once in the master of a pre-forking server
+# (gunicorn --preload) so the workers share the loaded snapshot.
+PRELOAD_DATA = os.environ.get('PRELOAD_DATA', 'false').lower() == 'true'
+
+# Each open prediction stream holds a worker thread until the model finishes, so
+# streams per process are capped; beyond the cap the page falls back to the form post
+MAX_STREAMS = int(os.environ.get('MAX_STREAMS', '8'))
+
+
+# Import the prediction path and load the current data snapshot and prediction cache.
+# The LLM and Twitter clients and the stats.nba.com transport hold sockets and
+# threads, so each worker still builds its own on first use.
+def preload():
+    start = time.perf_counter()
+    from data_store import get_snapshot
+    from predict_winner import prediction_cache
+    import fetch_nba_data
+    get_snapshot()
+    prediction_cache.resolve()
+    logging.info(f"Preloaded data snapshot and prediction modules in {time.perf_counter() - start:.3f}s.")
+
+# stats() of a component built on first use, or {} while its module is not imported
+# or it is not built yet, so /status and /metrics never load anything themselves
+def loaded_stats(module, name):
+    component = getattr(sys.modules.get(module), name, None)
+    if component is None or not getattr(component, 'built', True):
+        return {}
+    return component.stats()
+
+# Home team of the scheduled game on game_date, which the local model needs
+def find_home_team(team1, team2, game_date):
+    from data_store import get_snapshot
+    from fetch_nba_data import find_matchup_games
+    games = find_matchup_games(get_snapshot().schedule_index, team1, team2)
+    return next((game['Home Team'] for game in games if game['Game Date'] == game_date), None)
+
+
+# The Flask app. `config` holds the API keys (as returned by config.load_config(),
+# which reads keys.json and the environment on first use when no config is given).
+def create_app(config=None, preload_data=PRELOAD_DATA, max_streams=MAX_STREAMS):
+    app = Flask(__name__)
+    if config is not None:
+        configure(config)
+    open_streams = threading.BoundedSemaphore(max_streams)
+
+    # Background refresher for the shared NBA data files
+    refresher = DataRefresher()
+
+    # Request timings for /metrics; ?profile=1 dumps a cProfile of the request when PROFILE_REQUESTS=true
+    instrument_app(app)
+
+    # Component stats exported on /metrics next to the request and stage timings
+    metrics.register('refresh', refresher.status)
+    metrics.register('llm', lambda: loaded_stats('predict_winner', 'llm_client'))
+    metrics.register('prediction_cache', lambda: loaded_stats('predict_winner', 'prediction_cache'))
+    metrics.register('nba_api', lambda: loaded_stats('fetch_nba_data', 'nba_transport'))
+    metrics.register('game_logs', lambda: loaded_stats('game_log_store', 'game_log_store'))
+
+    @app.route('/', methods=['GET', 'POST'])
+    def home():
+        if request.method == 'POST':
+            if 'search' in request.form:
+                from data_store import get_snapshot
+                from fetch_nba_data import find_matchup_games
+                from fetch_tweets import tweet_ingestor
+                from predict_winner import matchup_contexts
+                metrics.count('requests_total', route='search')
+                team1 = request.form['team1']
+                team2 = request.form['team2']
+
+                # Start a background refresh if data is older than 24 hours; keep serving the current data
+                refresher.ensure_fresh()
+                snapshot = get_snapshot()
+
+                # Pick up new tweets in the background; the next snapshot includes them
+                try:
+                    tweet_ingestor.trigger()
+                except Exception as e:
+                    logging.error(f"Could not start tweet ingestion: {e}")
+
+                # Build the matchup context (recent games and prompt) now; the predict
+                # request reuses it from the shared cache, whichever worker serves it
+                logging.info(f"Preparing matchup context for {team1} and {team2}...")
+                try:
+                    matchup_contexts.get_or_build(snapshot, team1, team2)
+                except Exception as e:
+                    logging.error(f"Could not prepare matchup context: {e}")
+
+                # Get upcoming games for the selected teams
+                logging.info("Fetching upcoming games...")
+                upcoming_games = find_matchup_games(snapshot.schedule_index, team1, team2)
+
+                return render_template('index.html', nba_teams=nba_teams, team1=team1, team2=team2, upcoming_games=upcoming_games)
+
+            elif 'predict' in request.form:
+                from predict_winner import predict_winner
+                metrics.count('requests_total', route='predict')
+                team1 = request.form['team1']
+                team2 = request.form['team2']
+                game_date = request.form['game']
+                mode = request.form.get('mode', 'llm')
+                # The scheduled game tells the local model which team is at home
+                home_team = find_home_team(team1, team2, game_date)
+                logging.info("Generating prediction...")
+                with metrics.span('predict', mode=mode):
+                    prediction = predict_winner(team1, team2, mode=mode, home_team=home_team)
+                return render_template('index.html', nba_teams=nba_teams, prediction=prediction)
+
+        return render_template('index.html', nba_teams=nba_teams)
+
+    # Same prediction as the predict form, sent as server-sent events while the model
+    # writes it: 'local' and 'token' events carry JSON-encoded text, then 'done' (or 'error').
+    # The page falls back to the full-page form post when EventSource is unavailable
+    # or the stream is refused (503 once max_streams are open in this process).
+    @app.route('/predict/stream')
+    def predict_stream():
+        from predict_winner import stream_prediction
+        team1 = request.args['team1']
+        team2 = request.args['team2']
+        mode = request.args.get('mode', 'llm')
+        if not open_streams.acquire(blocking=False):
+            metrics.count('requests_total', route='predict_stream_rejected')
+            return Response("Too many open prediction streams.", status=503, headers={'Retry-After': '5'})
         try:
-            last_fetched = float(content)
-            return (time.time() - last_fetched) >= 86400
-        except ValueError:
-            return True
-
-# Update last fetched timestamp
-def update_last_fetched():
-    with open('last_fetched.txt', 'w') as f:
-        f.write(str(time.time()))
-
-@app.route('/', methods=['GET', 'POST'])
-def home():
-    if request.method == 'POST':
-        if 'search' in request.form:
-            team1 = request.form['team1']
-            team2 = request.form['team2']
-            
-            # Check if data is older than 24 hours
-            if should_fetch_data():
-                logging.info("Fetching new NBA data...")
-                save_all_nba_data()
-                update_last_fetched()
-            
-            # Fetch last 3 games stats for each team
-            logging.info(f"Fetching last 3 games stats for {team1} and {team2}...")
-            team1_last_3_games = fetch_last_3_games_stats(team1)
-            team2_last_3_games = fetch_last_3_games_stats(team2)
-            
-            # Save last 3 games stats to CSV files
-            team1_last_3_games.to_csv('last_3_games_stats_team1.csv', index=False)
-            team2_last_3_games.to_csv('last_3_games_stats_team2.csv', index=False)
-            
-            # Fetch relevant tweets
-            logging.info("Fetching relevant tweets...")
-            save_tweets(team1, team2, pd.read_csv('all_player_stats.csv')['PLAYER_NAME'].tolist())
-            
-            # Get upcoming games
-            logging.info("Fetching upcoming games...")
-            upcoming_games = pd.read_csv('schedule.csv')
-            
-            
-            # Filter upcoming games for the selected teams
-            upcoming_games = upcoming_games[
-                ((upcoming_games['Home Team'].str.strip().str.lower() == team1.lower()) & 
-                 (upcoming_games['Away Team'].str.strip().str.lower() == team2.lower())) |
-                ((upcoming_games['Home Team'].str.strip().str.lower() == team2.lower()) & 
-                 (upcoming_games['Away Team'].str.strip().str.lower() == team1.lower()))
-            ]
-            
-            return render_template('index.html', nba_teams=nba_teams, team1=team1, team2=team2, upcoming_games=upcoming_games.to_dict('records'))
-        
-        elif 'predict' in request.form:
-            team1 = request.form['team1']
-            team2 = request.form['team2']
-            game_date = request.form['game']
-            logging.info("Generating prediction...")
-            prediction = predict_winner(team1, team2)
-            return render_template('index.html', nba_teams=nba_teams, prediction=prediction)
-    
-    return render_template('index.html', nba_teams=nba_teams)
+            home_team = find_home_team(team1, team2, request.args.get('game'))
+        except Exception:
+            open_streams.release()
+            raise
+        metrics.count('requests_total', route='predict_stream')
+
+        def events():
+            for event, text in stream_prediction(team1, team2, mode=mode, home_team=home_team):
+                yield f"event: {event}\ndata: {json.dumps(text)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+
+        response = Response(stream_with_context(events()), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        # The server closes the response when the stream ends or the client goes away
+        response.call_on_close(open_streams.release)
+        return response
+
+    @app.route('/status')
+    def status():
+        tweets = getattr(sys.modules.get('fetch_tweets'), 'tweet_ingestor', None)
+        return jsonify({**refresher.status(), 'llm': loaded_stats('predict_winner', 'llm_client'),
+                        'prediction_cache': loaded_stats('predict_winner', 'prediction_cache'),
+                        'tweets': tweets.last_summary if tweets is not None and tweets.built else None,
+                        'nba_api': loaded_stats('fetch_nba_data', 'nba_transport')})
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    if preload_data:
+        preload()
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file
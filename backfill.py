@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fetch_nba_data import get_current_season, nba_transport
+from rate_limit import TokenBucket
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+HISTORY_DIR = 'history'
+CHECKPOINT_FILE = 'checkpoint.json'
+SEASON_TYPES = ('Regular Season', 'Playoffs')
+FIRST_SEASON = '2015-16'
+MAX_WORKERS = 3
+CALLS_PER_MINUTE = 30  # stats.nba.com requests started per minute
+
+
+# One fetcher per backfilled dataset: (season, season_type) -> DataFrame
+def _league_game_log(season, season_type):
+    from nba_api.stats.endpoints import leaguegamelog
+    nba_transport.resolve()
+    return leaguegamelog.LeagueGameLog(season=season, season_type_all_star=season_type,
+                                       player_or_team_abbreviation='T').get_data_frames()[0]
+
+def _team_dashboard(season, season_type):
+    from nba_api.stats.endpoints import leaguedashteamstats
+    nba_transport.resolve()
+    return leaguedashteamstats.LeagueDashTeamStats(season=season, season_type_all_star=season_type).get_data_frames()[0]
+
+def _player_dashboard(season, season_type):
+    from nba_api.stats.endpoints import leaguedashplayerstats
+    nba_transport.resolve()
+    return leaguedashplayerstats.LeagueDashPlayerStats(season=season, season_type_all_star=season_type).get_data_frames()[0]
+
+HISTORY_DATASETS = {
+    'game_log': _league_game_log,
+    'team_stats': _team_dashboard,
+    'player_stats': _player_dashboard,
+}
+
+
+# Season strings from `first` to `last` inclusive, e.g. '2021-22', '2022-23'
+def season_range(first, last):
+    return [f"{year}-{str(year + 1)[-2:]}" for year in range(int(first[:4]), int(last[:4]) + 1)]
+
+def partition_path(directory, dataset, season, season_type):
+    return os.path.join(directory, dataset, season, f"{season_type.replace(' ', '_').lower()}.feather")
+
+
+# Resumable multi-season backfill. Each (dataset, season, season type) is one
+# partition, fetched by a worker, written to history/<dataset>/<season>/<type>.feather
+# and dropped, so at most `max_workers` partitions are in memory at any time.
+# Finished partitions of past seasons are recorded in history/checkpoint.json and
+# skipped on the next run; the current season is always fetched again.
+class Backfill:
+    def __init__(self, directory=HISTORY_DIR, datasets=HISTORY_DATASETS, max_workers=MAX_WORKERS,
+                 calls_per_minute=CALLS_PER_MINUTE):
+        self.directory = directory
+        self.datasets = datasets
+        self.max_workers = max_workers
+        self.limiter = TokenBucket(rate=calls_per_minute / 60, capacity=max_workers)
+        self._lock = threading.Lock()
+        self.completed = self._load_checkpoint()
+
+    def _checkpoint_path(self):
+        return os.path.join(self.directory, CHECKPOINT_FILE)
+
+    def _load_checkpoint(self):
+        try:
+            with open(self._checkpoint_path(), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _mark_done(self, name, rows):
+        with self._lock:
+            self.completed[name] = {'rows': rows, 'fetched_at': time.time()}
+            os.makedirs(self.directory, exist_ok=True)
+            with open(f"{self._checkpoint_path()}.tmp", 'w') as f:
+                json.dump(self.completed, f, indent=1, sort_keys=True)
+            os.replace(f"{self._checkpoint_path()}.tmp", self._checkpoint_path())
+
+    def _fetch_partition(self, dataset, season, season_type):
+        self.limiter.acquire()
+        frame = self.datasets[dataset](season, season_type)
+        path = partition_path(self.directory, dataset, season, season_type)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        frame.reset_index(drop=True).to_feather(f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        return len(frame)
+
+    # Fetch every missing partition for `seasons`. Returns a run summary.
+    def run(self, seasons, datasets=None):
+        start = time.perf_counter()
+        current_season = get_current_season()
+        tasks, skipped = [], 0
+        for season in seasons:
+            for dataset in datasets or self.datasets:
+                for season_type in SEASON_TYPES:
+                    name = f"{dataset}/{season}/{season_type}"
+                    if name in self.completed and season < current_season and \
+                            os.path.exists(partition_path(self.directory, dataset, season, season_type)):
+                        skipped += 1
+                    else:
+                        tasks.append((name, dataset, season, season_type))
+        logging.info(f"Backfilling {len(tasks)} partitions ({skipped} already done)...")
+
+        rows = fetched = 0
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='backfill') as executor:
+            futures = {executor.submit(self._fetch_partition, *task[1:]): task[0] for task in tasks}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    count = future.result()
+                except Exception as e:
+                    logging.error(f"Backfill of {name} failed: {e}")
+                    failed.append(name)
+                    continue
+                self._mark_done(name, count)
+                rows += count
+                fetched += 1
+                logging.info(f"Backfilled {name}: {count} rows ({fetched}/{len(tasks)}).")
+
+        return {
+            'partitions': len(tasks) + skipped, 'fetched': fetched, 'skipped': skipped, 'failed': failed,
+            'rows': rows, 'wall_seconds': round(time.perf_counter() - start, 3),
+        }
+
+
+# Stream a backfilled dataset one partition at a time, oldest season first
+def iter_history(dataset, seasons=None, columns=None, directory=HISTORY_DIR):
+    base = os.path.join(directory, dataset)
+    if not os.path.isdir(base):
+        return
+    for season in sorted(os.listdir(base)):
+        if seasons is not None and season not in seasons:
+            continue
+        for season_type in SEASON_TYPES:
+            path = partition_path(directory, dataset, season, season_type)
+            if os.path.exists(path):
+                frame = pd.read_feather(path, columns=columns)
+                frame['SEASON'] = season
+                frame['SEASON_TYPE'] = season_type
+                yield frame
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backfill game logs and team/player dashboards for past seasons.")
+    parser.add_argument('--from', dest='first', default=FIRST_SEASON, help="First season, e.g. 2015-16")
+    parser.add_argument('--to', dest='last', default=get_current_season(), help="Last season (default: current)")
+    parser.add_argument('--datasets', nargs='*', choices=list(HISTORY_DATASETS), help="Datasets to backfill (default: all)")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--calls-per-minute', type=float, default=CALLS_PER_MINUTE)
+    parser.add_argument('--directory', default=HISTORY_DIR)
+    args = parser.parse_args()
+    backfill = Backfill(args.directory, max_workers=args.workers, calls_per_minute=args.calls_per_minute)
+    print(json.dumps(backfill.run(season_range(args.first, args.last), args.datasets), indent=2))
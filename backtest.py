@@ -0,0 +1,236 @@
+import os
+import re
+import json
+import math
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from backfill import HISTORY_DIR, iter_history
+from team_index import ABBREVIATION_TEAMS, TEAM_IDS, TeamIndex
+import local_model
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+PREDICTORS = ('local', 'llm-stub', 'llm', 'llm-cached')
+STAGES = ('snapshot', 'context', 'predict')
+MIN_GAMES_PLAYED = 5  # Skip games until both teams have this many games of history
+# Replies of the `llm` predictor, keyed like the app's prediction cache and replayed by `llm-cached`
+REPLY_CACHE_DIR = 'backtest_predictions'
+STUB_SCALE = 7.0  # Points of edge per unit of log-odds in the stub's confidence
+STUB_FORM_WEIGHT = 2.0  # Points of edge per extra win in the listed recent games
+
+
+# The parts of a DataSnapshot that build_prompt reads, rebuilt from the games
+# played before one date. Player dashboards and injuries are season-level or
+# current-day data, so they are left out rather than leaking the future.
+# `version` keys the prompt builder's per-snapshot cache, so it must differ per date.
+class PointInTimeSnapshot:
+    def __init__(self, team_stats, version):
+        self.version = version
+        self.team_stats = team_stats
+        self.tweets = pd.DataFrame(columns=['Username', 'Tweet', 'Created At'])
+        self.tweet_index = None
+        self.team_index = TeamIndex(
+            team_stats, pd.DataFrame(columns=['TEAM_ABBREVIATION', 'PLAYER_NAME', 'PTS']),
+            pd.DataFrame(columns=['Team', 'Player', 'Status']))
+
+
+# Season-to-date team totals (dashboard layout) from LeagueGameLog team rows
+def team_stats_from_games(games):
+    games = games.assign(GP=1, W=(games['WL'] == 'W').astype(int))
+    stats = games.groupby('TEAM_ABBREVIATION', sort=True)[['GP', 'W', 'FGM', 'FGA', 'FG3M', 'FG3A', 'PTS', 'PLUS_MINUS']].sum()
+    stats['L'] = stats['GP'] - stats['W']
+    stats['FG_PCT'] = (stats['FGM'] / stats['FGA']).round(3)
+    stats['FG3_PCT'] = (stats['FG3M'] / stats['FG3A']).round(3)
+    stats = stats.reset_index()
+    stats['TEAM_NAME'] = stats['TEAM_ABBREVIATION'].map(ABBREVIATION_TEAMS)
+    stats = stats.dropna(subset=['TEAM_NAME'])
+    stats['TEAM_ID'] = stats['TEAM_NAME'].str.lower().map(TEAM_IDS)
+    return stats.reset_index(drop=True)
+
+# Winner and confidence (0-1) from a model reply that follows the prompt template
+def parse_pick(text, team1, team2):
+    section = text.split('Winner Prediction', 1)[-1]
+    positions = {team: section.find(team) for team in (team1, team2) if team in section}
+    if not positions:
+        return None, None
+    winner = min(positions, key=positions.get)
+    confidence = re.search(r'Confidence:\s*\**\s*(\d+(?:\.\d+)?)\s*%', section)
+    return winner, float(confidence.group(1)) / 100 if confidence else 0.5
+
+
+# Per-team numbers a reader of the prompt sees: per-game +/- from the record line
+# and the wins among the listed last games. Teams whose lines were trimmed are missing.
+def _prompt_teams(prompt):
+    teams = {}
+    for block in re.split(r'^### ', prompt, flags=re.M)[1:]:
+        name, _, body = block.partition('\n')
+        plus_minus = re.search(r'^- Record .*\+/- ([+-]?\d+(?:\.\d+)?)', body, re.M)
+        if plus_minus:
+            recent = re.findall(r'^  - \S+ .+ ([WL]) \d+$', body, re.M)
+            teams[name.strip()] = float(plus_minus.group(1)) + STUB_FORM_WEIGHT * (recent.count('W') - len(recent) / 2)
+    return teams
+
+# Stand-in for the chat model that reads only the prompt: it picks the team with the
+# larger edge in the record and recent-games lines and answers in the prompt's
+# template, so its scores show what the prompt carries rather than the local model
+def _stub_reply(prompt, home, away):
+    teams = _prompt_teams(prompt)
+    if home not in teams or away not in teams:
+        return "No pick: the prompt lacks a team's record."
+    edge = teams[home] - teams[away]
+    winner = home if edge >= 0 else away
+    confidence = 1 / (1 + math.exp(-abs(edge) / STUB_SCALE))
+    return f"## 🏆 **Winner Prediction**\n**{winner}** (Confidence: {confidence * 100:.0f}%)\n\n### **Reasoning:**\nStub."
+
+_reply_cache = None
+
+# Replies of the `llm` predictor, kept without expiry so later `llm-cached` runs can score them again
+def reply_cache():
+    global _reply_cache
+    if _reply_cache is None:
+        from prediction_cache import PredictionCache
+        _reply_cache = PredictionCache(directory=REPLY_CACHE_DIR, ttl=float('inf'), max_entries=1_000_000)
+    return _reply_cache
+
+# Probability that the home team wins, or None when no prediction is available
+def _predict(predictor, snapshot, home, away, context):
+    from prediction_cache import prediction_key
+    if predictor == 'local':
+        return local_model.predict_matchup(snapshot.team_stats, home, away, home)['team1_probability']
+    if predictor == 'llm-stub':
+        reply = _stub_reply(context, home, away)
+    elif predictor == 'llm':
+        from predict_winner import llm_client
+        from llm_client import LLMError
+        try:
+            reply = reply_cache().get_or_compute(prediction_key(home, away, context), lambda: llm_client.chat(context)[0])
+        except LLMError as e:
+            logging.error(f"Prediction for {home} vs {away} failed: {e}")
+            return None
+    else:
+        # Only replies recorded by an earlier `llm` run match: the app's own cache is
+        # keyed on prompts built from today's game logs, which a replay cannot rebuild
+        reply = reply_cache().get(prediction_key(home, away, context))
+        if reply is None:
+            return None
+    winner, confidence = parse_pick(reply, home, away)
+    if winner is None:
+        return None
+    return confidence if winner == home else 1 - confidence
+
+def _build_context(predictor, snapshot, home, away, prior):
+    if predictor == 'local':
+        return None
+    from predict_winner import build_prompt
+    last_3 = {team: prior[prior['TEAM_NAME_FULL'] == team].head(3) for team in (home, away)}
+    return build_prompt(snapshot, home, away, last_3[home], last_3[away])
+
+
+# Replay the games of one season on the given dates. Runs in a worker process and
+# reads its season from the history partitions itself, so only dates and results cross processes.
+def backtest_chunk(season, dates, predictor, directory=HISTORY_DIR):
+    logging.getLogger().setLevel(logging.ERROR)  # The prompt path logs every game
+    log = pd.concat(list(iter_history('game_log', seasons=[season], directory=directory)), ignore_index=True)
+    log['GAME_DATE'] = pd.to_datetime(log['GAME_DATE'])
+    log['TEAM_NAME_FULL'] = log['TEAM_ABBREVIATION'].map(ABBREVIATION_TEAMS)
+    log = log.sort_values('GAME_DATE', ascending=False, kind='stable')
+    games = local_model.games_from_team_logs(log.rename(columns={'GAME_ID': 'Game_ID'}))
+
+    results = []
+    for date in dates:
+        day = pd.Timestamp(date)
+        start = time.perf_counter()
+        prior = log[log['GAME_DATE'] < day]
+        snapshot = PointInTimeSnapshot(team_stats_from_games(prior), (season, str(day.date())))
+        snapshot_seconds = time.perf_counter() - start
+        played = snapshot.team_stats.set_index('TEAM_NAME')['GP']
+
+        for game in games[games['GAME_DATE'] == day].to_dict('records'):
+            home, away = game['HOME'], game['AWAY']
+            if min(played.get(home, 0), played.get(away, 0)) < MIN_GAMES_PLAYED:
+                continue
+            start = time.perf_counter()
+            context = _build_context(predictor, snapshot, home, away, prior)
+            context_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            probability = _predict(predictor, snapshot, home, away, context)
+            predict_seconds = time.perf_counter() - start
+            results.append({
+                'season': season, 'game_date': str(day.date()), 'home_team': home, 'away_team': away,
+                'home_won': bool(game['HOME_WON']), 'home_probability': probability,
+                'seconds': {'snapshot': snapshot_seconds, 'context': context_seconds, 'predict': predict_seconds},
+            })
+    return results
+
+
+# Accuracy, Brier score and per-stage latency (ms) over backtest results
+def summarize(results, wall_seconds):
+    scored = [result for result in results if result['home_probability'] is not None]
+    summary = {'games': len(results), 'scored': len(scored), 'wall_seconds': round(wall_seconds, 3),
+               'games_per_second': round(len(results) / wall_seconds, 1) if wall_seconds else None}
+    if scored:
+        probability = np.array([result['home_probability'] for result in scored])
+        outcome = np.array([result['home_won'] for result in scored], dtype=np.float64)
+        summary['accuracy'] = round(float(((probability >= 0.5) == (outcome == 1)).mean()), 4)
+        summary['brier'] = round(float(((probability - outcome) ** 2).mean()), 4)
+    for stage in STAGES:
+        seconds = np.array([result['seconds'][stage] for result in results]) * 1000
+        if len(seconds):
+            summary[f'{stage}_ms'] = {'mean': round(float(seconds.mean()), 3),
+                                      'p50': round(float(np.percentile(seconds, 50)), 3),
+                                      'p95': round(float(np.percentile(seconds, 95)), 3)}
+    return summary
+
+# Replay every backfilled game of `seasons` through `predictor` on `workers` processes
+def run_backtest(seasons=None, predictor='local', workers=os.cpu_count(), directory=HISTORY_DIR):
+    if predictor not in PREDICTORS:
+        raise ValueError(f"Unknown predictor '{predictor}'.")
+    if predictor == 'llm' and workers > 1:
+        # One process, so every reply lands in the same reply cache file
+        logging.info("The llm predictor runs in a single process.")
+        workers = 1
+    chunks = []
+    for frame in iter_history('game_log', seasons=seasons, columns=['GAME_DATE'], directory=directory):
+        dates = sorted(pd.to_datetime(frame['GAME_DATE']).dt.strftime('%Y-%m-%d').unique())
+        season = frame['SEASON'].iloc[0]
+        # Several chunks per season so seasons of different sizes still spread across workers
+        for part in np.array_split(np.array(dates), max(1, min(len(dates), workers))):
+            if len(part):
+                chunks.append((season, part.tolist()))
+
+    start = time.perf_counter()
+    results = []
+    if workers <= 1:
+        for season, dates in chunks:
+            results.extend(backtest_chunk(season, dates, predictor, directory))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(backtest_chunk, season, dates, predictor, directory) for season, dates in chunks]
+            for future in futures:
+                results.extend(future.result())
+    summary = summarize(results, time.perf_counter() - start)
+    summary.update({'predictor': predictor, 'workers': workers})
+    return summary, results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay backfilled games through the prediction path.")
+    parser.add_argument('--seasons', nargs='*', help="Seasons to replay (default: all backfilled)")
+    parser.add_argument('--predictor', choices=PREDICTORS, default='local',
+                        help="local model, stub that reads the prompt, the chat model (replies are recorded), "
+                             "or replies recorded by an earlier llm run")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', help="Write one JSON line per game here")
+    parser.add_argument('--directory', default=HISTORY_DIR)
+    args = parser.parse_args()
+    summary, results = run_backtest(args.seasons, args.predictor, args.workers, args.directory)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(result) + '\n')
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,99 @@
+import json
+import time
+import logging
+import argparse
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from data_store import get_snapshot
+from game_log_store import fetch_last_3_games_stats
+from predict_winner import build_prompt, cached_prediction
+from rate_limit import TokenBucket
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+OUTPUT_FILE = 'predictions.jsonl'
+MAX_CONCURRENCY = 4  # Model calls in flight at once
+CALLS_PER_MINUTE = 20  # Upstream model calls started per minute
+
+
+# Build the prompt for every game from one snapshot. Each team's recent games
+# are fetched once, concurrently, even if it plays several games in the window.
+def build_slate_contexts(snapshot, games, max_workers=MAX_CONCURRENCY):
+    team_names = sorted({game['Home Team'] for game in games} | {game['Away Team'] for game in games})
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='slate-logs') as executor:
+        last_games = dict(zip(team_names, executor.map(
+            lambda team: fetch_last_3_games_stats(team, snapshot.schedule_index), team_names)))
+
+    contexts = []
+    for game in games:
+        home, away = game['Home Team'], game['Away Team']
+        try:
+            prompt = build_prompt(snapshot, home, away, last_games[home], last_games[away])
+        except Exception as e:
+            logging.error(f"Skipping {home} vs {away} on {game['Game Date']}: {e}")
+            continue
+        contexts.append({'game': game, 'prompt': prompt})
+    return contexts
+
+# Predict every game in the schedule (or in `games`), writing one JSON line per
+# game to `output_path` as soon as it completes. Returns a run summary.
+def predict_slate(output_path=OUTPUT_FILE, games=None, max_concurrency=MAX_CONCURRENCY,
+                  calls_per_minute=CALLS_PER_MINUTE, predict=cached_prediction):
+    start = time.perf_counter()
+    snapshot = get_snapshot()
+    if games is None:
+        games = snapshot.schedule.to_dict('records')
+    contexts = build_slate_contexts(snapshot, games)
+    context_seconds = time.perf_counter() - start
+    logging.info(f"Built {len(contexts)} matchup contexts in {context_seconds:.2f}s.")
+
+    limiter = TokenBucket(rate=calls_per_minute / 60, capacity=max_concurrency)
+
+    def run(context):
+        home, away = context['game']['Home Team'], context['game']['Away Team']
+        limiter.acquire()
+        call_start = time.perf_counter()
+        try:
+            return {'prediction': predict(home, away, context['prompt']), 'error': None}, time.perf_counter() - call_start
+        except Exception as e:
+            return {'prediction': None, 'error': str(e)}, time.perf_counter() - call_start
+
+    succeeded = failed = 0
+    with open(output_path, 'a', encoding='utf-8') as output, \
+            ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='slate-predict') as executor:
+        futures = {executor.submit(run, context): context for context in contexts}
+        for future in as_completed(futures):
+            game = futures[future]['game']
+            result, seconds = future.result()
+            record = {
+                'game_date': game['Game Date'], 'game_id': None if pd.isna(game.get('Game ID')) else game['Game ID'],
+                'home_team': game['Home Team'], 'away_team': game['Away Team'],
+                'seconds': round(seconds, 3), 'completed_at': time.time(), **result,
+            }
+            output.write(json.dumps(record, default=str) + '\n')
+            output.flush()
+            if result['error'] is None:
+                succeeded += 1
+            else:
+                failed += 1
+                logging.warning(f"Prediction failed for {game['Home Team']} vs {game['Away Team']}: {result['error']}")
+
+    wall = time.perf_counter() - start
+    summary = {
+        'games': len(games), 'predicted': succeeded, 'failed': failed, 'skipped': len(games) - len(contexts),
+        'context_seconds': round(context_seconds, 3), 'wall_seconds': round(wall, 3),
+        'games_per_second': round((succeeded + failed) / wall, 3) if wall else None,
+    }
+    logging.info(f"Slate finished: {summary}")
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Predict every game in the upcoming schedule.")
+    parser.add_argument('--output', default=OUTPUT_FILE, help="JSON lines file to append results to")
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY)
+    parser.add_argument('--calls-per-minute', type=float, default=CALLS_PER_MINUTE)
+    args = parser.parse_args()
+    print(json.dumps(predict_slate(args.output, max_concurrency=args.concurrency,
+                                   calls_per_minute=args.calls_per_minute), indent=2))
@@ -0,0 +1,365 @@
+import sys
+import time
+import logging
+import os
+import glob
+import json
+import random
+import argparse
+import tempfile
+import subprocess
+import requests
+import pandas as pd
+from data_store import DATASETS, SnapshotStore
+from team_index import NBA_TEAMS
+from game_log_store import GAME_LOG_DIR
+import local_model
+from tweet_matcher import TweetMatcher, TweetIndex
+from snapshot_io import SNAPSHOT_DATASETS, read_csv_dataset, read_snapshot_dataset, write_snapshot
+
+# Keep the benchmark output readable
+logging.getLogger().setLevel(logging.WARNING)
+
+
+# Run fn `iterations` times and return the mean time per call in milliseconds
+def time_per_call(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) * 1000 / iterations
+
+# Per-request data loading: re-parsing every CSV (old path) vs. the shared snapshot store
+def bench_snapshot_store(iterations=50):
+    def parse_csvs():
+        for spec in DATASETS.values():
+            try:
+                pd.read_csv(spec['path'])
+            except FileNotFoundError:
+                pass
+
+    store = SnapshotStore()
+    cold = time_per_call(store.get, 1)
+    results = {
+        'read_csv per request (ms)': time_per_call(parse_csvs, iterations),
+        'snapshot cold load (ms)': cold,
+        'snapshot per request (ms)': time_per_call(store.get, iterations),
+    }
+    return results
+
+
+# Resident memory growth (KB) of a fresh worker process that loads every snapshot
+# dataset with `loader`. Reads VmRSS from /proc, so it needs Linux.
+def _worker_load_rss(loader, data_dir, snapshot_id):
+    if loader == 'read_snapshot_dataset':
+        calls = [(snapshot_id, name, data_dir) for name in SNAPSHOT_DATASETS]
+    else:
+        calls = [(name, data_dir) for name in SNAPSHOT_DATASETS]
+    script = (
+        "import gc, snapshot_io\n"
+        "def rss():\n"
+        "    with open('/proc/self/status') as f:\n"
+        "        return next(int(line.split()[1]) for line in f if line.startswith('VmRSS'))\n"
+        "gc.collect()\n"
+        "before = rss()\n"
+        f"frames = [snapshot_io.{loader}(*args) for args in {calls!r}]\n"
+        "print(rss() - before)\n"
+    )
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+    return int(output.strip().splitlines()[-1])
+
+# Loading the ingested datasets from CSV text vs. the memory-mapped Feather snapshot
+def bench_snapshot_format(iterations=50):
+    with tempfile.TemporaryDirectory() as data_dir:
+        frames = {name: pd.read_csv(DATASETS[name]['path']) for name in SNAPSHOT_DATASETS}
+        for name in SNAPSHOT_DATASETS:
+            frames[name].to_csv(f"{data_dir}/{DATASETS[name]['path']}", index=False)
+        snapshot_id = write_snapshot(frames, data_dir=data_dir, write_csv=False)
+
+        def load_csv():
+            for name in SNAPSHOT_DATASETS:
+                read_csv_dataset(name, data_dir)
+
+        def load_feather():
+            for name in SNAPSHOT_DATASETS:
+                read_snapshot_dataset(snapshot_id, name, data_dir)
+
+        return {
+            'CSV load (ms)': time_per_call(load_csv, iterations),
+            'Feather load (ms)': time_per_call(load_feather, iterations),
+            'CSV worker RSS growth (KB)': _worker_load_rss('read_csv_dataset', data_dir, snapshot_id),
+            'Feather worker RSS growth (KB)': _worker_load_rss('read_snapshot_dataset', data_dir, snapshot_id),
+        }
+
+
+# Tagging tweets by team: per-tweet keyword loop (old path) vs. the compiled matcher
+def bench_tweet_matcher(tweet_count=2000):
+    snapshot = SnapshotStore().get()
+    team_index = snapshot.team_index
+    names = snapshot.player_stats['PLAYER_NAME'].tolist()
+    rng = random.Random(0)
+    tweets = pd.DataFrame({'Tweet': [
+        f"Injury update: {rng.choice(names)} is questionable tonight, per sources. {'Big win for the ' + rng.choice(NBA_TEAMS) if i % 3 == 0 else ''}"
+        for i in range(tweet_count)
+    ]})
+    team1, team2 = 'Denver Nuggets', 'Oklahoma City Thunder'
+
+    def keyword_loop():
+        keywords = [keyword.lower() for keyword in [team1, team2] + team_index.player_names(team1) + team_index.player_names(team2)]
+        return [tweet for tweet in tweets.to_dict('records') if any(keyword in tweet['Tweet'].lower() for keyword in keywords)]
+
+    start = time.perf_counter()
+    matcher = TweetMatcher(team_index)
+    compile_ms = (time.perf_counter() - start) * 1000
+    index = TweetIndex(tweets, matcher)
+    return {
+        'tweets': tweet_count,
+        'roster names': len(names),
+        'keyword loop, one matchup (ms)': time_per_call(keyword_loop, 3),
+        'matcher compile (ms)': compile_ms,
+        'tag all tweets, every team (ms)': time_per_call(lambda: TweetIndex(tweets, matcher), 3),
+        'lookup per matchup (ms)': time_per_call(lambda: index.for_teams(team1, team2), 100),
+    }
+
+
+# Local statistical model vs. the LLM path: latency, plus out-of-sample accuracy.
+# Games come from the backfilled history (or the local game log store), each scored
+# with ratings from the games before it; the coefficients are fitted on the earliest
+# TRAIN_FRACTION of the games and scored on the later ones only.
+# LLM latency comes from batch runs in predictions.jsonl.
+TRAIN_FRACTION = 0.7
+
+def bench_local_model(iterations=1000):
+    from backfill import iter_history
+    snapshot = SnapshotStore().get()
+    team_stats = snapshot.team_stats
+    logs = list(iter_history('game_log')) or \
+        [pd.read_feather(path) for path in glob.glob(os.path.join(GAME_LOG_DIR, '*', '*.feather'))]
+    games = local_model.games_with_pregame_ratings(pd.concat(logs, ignore_index=True)) if logs else pd.DataFrame()
+    split = int(len(games) * TRAIN_FRACTION)
+    home_advantage, scale = local_model.fit(games.iloc[:split])
+    evaluation = local_model.evaluate(games.iloc[split:], home_advantage, scale)
+
+    results = {
+        'all-pairs matrix (ms)': time_per_call(lambda: local_model.win_probability_matrix(team_stats), iterations),
+        'single matchup (ms)': time_per_call(
+            lambda: local_model.predict_matchup(team_stats, 'Denver Nuggets', 'Oklahoma City Thunder'), iterations),
+        'fitted on games': split,
+        'fitted home advantage (pts)': home_advantage,
+        'fitted scale (pts)': scale,
+        'held-out games': evaluation['games'],
+        'local accuracy': evaluation['accuracy'] if evaluation['accuracy'] is not None else 'n/a',
+        'local Brier score': evaluation['brier'] if evaluation['brier'] is not None else 'n/a',
+    }
+    if os.path.exists('predictions.jsonl'):
+        with open('predictions.jsonl', encoding='utf-8') as f:
+            seconds = [record['seconds'] for record in map(json.loads, f) if record.get('error') is None]
+        if seconds:
+            results['LLM mean latency (ms)'] = sum(seconds) * 1000 / len(seconds)
+    return results
+
+
+# ESPN-style injuries page for the rows in nba_injuries.csv, padded with the
+# navigation and script noise of the real page around the per-team tables
+def injury_page_html(injuries, filler_blocks=400):
+    noise = ''.join(f'<div class="nav"><a href="/nba/team/{i}">Link {i}</a><script>var x{i} = {i};</script></div>'
+                    for i in range(filler_blocks))
+    tables = []
+    for team, rows in injuries.groupby('Team', sort=False):
+        body = ''.join(
+            f'<tr class="Table__TR Table__TR--sm Table__even"><td>{row.Player}</td><td>{row.Position}</td>'
+            f'<td>{row._4}</td><td><span>{row.Status}</span></td><td>Comment on {row.Player}.</td></tr>'
+            for row in rows.itertuples())
+        tables.append(f'<div class="ResponsiveTable Table__league-injuries"><div class="Table__Title">'
+                      f'<span class="injuries__teamName ml2">{team}</span></div><table><tbody>{body}</tbody></table></div>')
+    return f"<html><head><title>NBA Injuries</title></head><body>{noise}{''.join(tables)}{noise}</body></html>"
+
+# Injuries scraper: full html.parser tree (old path) vs. parsing only the injury
+# tables, and the cost of a refresh when the page is unchanged (content hash or 304)
+def bench_injuries(iterations=20):
+    from bs4 import BeautifulSoup
+    from http_cache import ConditionalGet
+    from fetch_nba_data import parse_injuries, fetch_nba_injuries
+
+    html = injury_page_html(pd.read_csv('nba_injuries.csv'))
+
+    def full_tree():
+        soup = BeautifulSoup(html, 'html.parser')
+        return soup.find_all('div', class_='ResponsiveTable Table__league-injuries')
+
+    class FixtureSession:
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+        def get(self, url, headers=None, timeout=None):
+            response = requests.Response()
+            response.status_code = self.status_code if 'If-None-Match' in (headers or {}) else 200
+            response._content = html.encode('utf-8')
+            response.encoding = 'utf-8'
+            response.headers['ETag'] = '"fixture"'
+            return response
+
+    with tempfile.TemporaryDirectory() as directory:
+        unchanged = ConditionalGet('injuries', directory, session=FixtureSession(200))
+        not_modified = ConditionalGet('injuries', directory, session=FixtureSession(304))
+        fetch_nba_injuries(page=unchanged)
+        rows = len(parse_injuries(html))
+        return {
+            'page size (KB)': len(html) / 1024,
+            'injury rows': rows,
+            'full html.parser tree (ms)': time_per_call(full_tree, iterations),
+            'injury tables only (ms)': time_per_call(lambda: parse_injuries(html), iterations),
+            'refresh, same content hash (ms)': time_per_call(lambda: fetch_nba_injuries(page=unchanged), iterations),
+            'refresh, 304 not modified (ms)': time_per_call(lambda: fetch_nba_injuries(page=not_modified), iterations),
+        }
+
+
+# The verbose prompt predict_winner used to send (whole Python reprs of the last
+# games and tweets), rebuilt from scratch on every call. Kept for comparison.
+def legacy_prompt(snapshot, team1, team2, team1_last_3_games, team2_last_3_games):
+    team_index = snapshot.team_index
+
+    # Filter relevant tweets (tweets that mention the teams or their players)
+    if snapshot.tweets.empty:
+        tweets_info = "No tweets available."
+        logging.warning("No tweets found. Proceeding without tweets.")
+    else:
+        relevant_tweets = snapshot.tweet_index.for_teams(team_index.resolve(team1), team_index.resolve(team2))
+        tweets_info = relevant_tweets if relevant_tweets else "No relevant tweets available."
+
+    # Look up the selected teams in the index
+    logging.info(f"Looking up stats for {team1} and {team2}...")
+    team1_stats = team_index.team_stats(team1)
+    team2_stats = team_index.team_stats(team2)
+    team1_players = team_index.top_players(team1, 5)
+    team2_players = team_index.top_players(team2, 5)
+    team1_missings = team_index.injuries(team1)
+    team2_missings = team_index.injuries(team2)
+
+    # Generate GPT prompt
+    prompt = f"""
+        ## 🏀 Predict the Winner: {team1} vs {team2}
+
+        ### **Team 1: {team1}**
+        - **Record:** {team1_stats['W']}W - {team1_stats['L']}L
+        - **Points Per Game:** {team1_stats['PTS']}
+        - **Field Goal Percentage:** {team1_stats['FG_PCT']}
+        - **Three-Point Percentage:** {team1_stats['FG3_PCT']}
+        - **Key Players:** {', '.join(player['PLAYER_NAME'] for player in team1_players)}
+        - **Last 3 Games:** {team1_last_3_games[['GAME_DATE', 'MATCHUP', 'WL', 'PTS']].to_dict('records')}
+        - **Injuries & Absences:** {', '.join(f"{player['Player']} ({player['Status']})" for player in team1_missings)}
+
+        ### **Team 2: {team2}**
+        - **Record:** {team2_stats['W']}W - {team2_stats['L']}L
+        - **Points Per Game:** {team2_stats['PTS']}
+        - **Field Goal Percentage:** {team2_stats['FG_PCT']}
+        - **Three-Point Percentage:** {team2_stats['FG3_PCT']}
+        - **Key Players:** {', '.join(player['PLAYER_NAME'] for player in team2_players)}
+        - **Last 3 Games:** {team2_last_3_games[['GAME_DATE', 'MATCHUP', 'WL', 'PTS']].to_dict('records')}
+        - **Injuries & Absences:** {', '.join(f"{player['Player']} ({player['Status']})" for player in team2_missings)}
+
+        ### **🗣️ Relevant Social Media Insights**
+        {tweets_info}
+
+        ## 🔍 **Analysis & Prediction**
+        1. **Compare team performance metrics** (scoring, efficiency, defense, key player impact).  
+        2. **Analyze recent form** (last 3 games and notable trends).  
+        3. **Account for injuries and absences** (impact on rotations and depth).  
+        4. **Factor in social media buzz** (any last-minute reports or significant trends).  
+        5. **Determine the most probable winner with a confidence score (%)**.
+
+        ---
+        ## 🏆 **Winner Prediction**  
+        **[Predicted_Winner]** (Confidence: [Confidence_Score]%)
+
+        ### **Reasoning:**  
+        [Detailed_Analysis]
+        """
+    return prompt
+
+# Prompt construction: the old verbose prompt vs. the compact prompt builder,
+# cold (sections rendered) and warm (team sections cached for the snapshot)
+def bench_prompt_builder(iterations=200):
+    from prompt_builder import PromptBuilder, estimate_tokens
+    snapshot = SnapshotStore().get()
+    team1, team2 = 'Denver Nuggets', 'Oklahoma City Thunder'
+    last_games = pd.DataFrame({
+        'GAME_DATE': pd.to_datetime(['2025-04-10', '2025-04-08', '2025-04-06']), 'MATCHUP': ['DEN vs. OKC', 'DEN @ LAL', 'DEN vs. BOS'],
+        'WL': ['W', 'L', 'W'], 'PTS': [120, 101, 115], 'FG_PCT': [0.52, 0.44, 0.49], 'REB': [45, 40, 48], 'AST': [30, 22, 28],
+    })
+
+    def cold():
+        return PromptBuilder().build(snapshot, team1, team2, last_games, last_games)
+
+    builder = PromptBuilder()
+    prompt, report = builder.build(snapshot, team1, team2, last_games, last_games)
+    legacy = legacy_prompt(snapshot, team1, team2, last_games, last_games)
+    return {
+        'legacy prompt tokens': estimate_tokens(legacy),
+        'compact prompt tokens': report['tokens'],
+        'tokens saved': estimate_tokens(legacy) - report['tokens'],
+        'legacy build (ms)': time_per_call(lambda: legacy_prompt(snapshot, team1, team2, last_games, last_games), iterations),
+        'compact build, cold (ms)': time_per_call(cold, iterations),
+        'compact build, cached teams (ms)': time_per_call(
+            lambda: builder.build(snapshot, team1, team2, last_games, last_games), iterations),
+    }
+
+
+# Cold start of a fresh worker process: importing app, create_app() and the first
+# request (a local-model prediction, which loads the snapshot and prediction path),
+# with the default lazy loading and with preload_data. The last row imports every
+# module and dependency the app used to load at import time, for comparison.
+def _cold_start(preload_data):
+    script = (
+        "import json, time, logging\n"
+        "start = time.perf_counter()\n"
+        "import app\n"
+        "imported = time.perf_counter()\n"
+        "logging.getLogger().setLevel(logging.WARNING)\n"
+        f"flask_app = app.create_app({{}}, preload_data={preload_data!r})\n"
+        "created = time.perf_counter()\n"
+        "flask_app.test_client().get('/predict/stream', query_string={'team1': 'Denver Nuggets', "
+        "'team2': 'Oklahoma City Thunder', 'mode': 'local'}).get_data()\n"
+        "print(json.dumps([imported - start, created - imported, time.perf_counter() - created]))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+    return [seconds * 1000 for seconds in json.loads(output.strip().splitlines()[-1])]
+
+def bench_startup():
+    import_ms, create_ms, first_ms = _cold_start(False)
+    _, preload_create_ms, preload_first_ms = _cold_start(True)
+    script = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        "import app, predict_winner, fetch_tweets, fetch_nba_data, tweepy, bs4, nba_api.stats.endpoints\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+    return {
+        'import app (ms)': import_ms,
+        'create_app (ms)': create_ms,
+        'first prediction (ms)': first_ms,
+        'create_app, preload (ms)': preload_create_ms,
+        'first prediction, preload (ms)': preload_first_ms,
+        'import everything eagerly (ms)': float(output.strip().splitlines()[-1]) * 1000,
+    }
+
+
+BENCHMARKS = {
+    'snapshot': bench_snapshot_store,
+    'snapshot_format': bench_snapshot_format,
+    'tweet_matcher': bench_tweet_matcher,
+    'local_model': bench_local_model,
+    'injuries': bench_injuries,
+    'prompt_builder': bench_prompt_builder,
+    'startup': bench_startup,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark hot paths of the prediction app.")
+    parser.add_argument('names', nargs='*', help="Benchmarks to run (default: all)")
+    args = parser.parse_args()
+
+    for name in args.names or BENCHMARKS:
+        print(f"== {name}")
+        for label, value in BENCHMARKS[name]().items():
+            print(f"  {label:<40} {value:>10.3f}" if isinstance(value, float) else f"  {label:<40} {value:>10}")
@@ -0,0 +1,77 @@
+import os
+import json
+import logging
+import threading
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+KEYS_FILE = 'keys.json'
+# API keys the app uses; an environment variable of the same name overrides keys.json
+API_KEYS = ('OPENAI_API_KEY', 'DEEPSEEK_API_KEY', 'TWITTER_BEARER_TOKEN')
+
+
+# Configuration dict whose missing keys fail with a message saying where to set them
+class Config(dict):
+    def __missing__(self, key):
+        raise KeyError(f"{key} is not configured; add it to {KEYS_FILE} or set it as an environment variable")
+
+
+# API keys from keys.json (if present), overridden by environment variables. A
+# missing key only fails when the client that needs it is first built.
+def load_config(path=KEYS_FILE):
+    config = Config()
+    try:
+        with open(path) as f:
+            config.update(json.load(f))
+    except FileNotFoundError:
+        logging.info(f"{path} not found; reading API keys from the environment.")
+    config.update({name: os.environ[name] for name in API_KEYS if os.environ.get(name)})
+    return config
+
+
+_config = None
+_config_lock = threading.Lock()
+
+# Use `config` for every client built from now on; the app factory passes its config here
+def configure(config):
+    global _config
+    with _config_lock:
+        _config = Config(config)
+
+# The process configuration, loaded with load_config() on first use unless configure() ran
+def get_config():
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = load_config()
+        return _config
+
+
+# Stand-in for a shared object that is built by `factory` on first attribute access,
+# so modules can keep clients as module-level names without doing I/O at import.
+# `built` tells status pages whether it exists yet without building it.
+class Lazy:
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = None
+        self._lock = threading.Lock()
+
+    @property
+    def built(self):
+        return self._value is not None
+
+    def resolve(self):
+        value = self._value
+        if value is None:
+            with self._lock:
+                if self._value is None:
+                    self._value = self._factory()
+                value = self._value
+        return value
+
+    # Only called for attributes Lazy itself does not have
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
@@ -0,0 +1,116 @@
+import os
+import time
+import logging
+import threading
+from file_lock import acquire_file_lock, release_file_lock
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+LAST_FETCHED_FILE = 'last_fetched.txt'
+REFRESH_LOCK_FILE = 'refresh.lock'
+MAX_DATA_AGE = 86400  # Refresh data older than 24 hours
+
+
+# The full NBA data refresh. fetch_nba_data (nba_api, BeautifulSoup) is imported
+# on the first refresh rather than when a refresher is created.
+def refresh_nba_data():
+    from fetch_nba_data import save_all_nba_data
+    return save_all_nba_data()
+
+# Read the timestamp of the last successful refresh, or None if there isn't one
+def read_last_fetched(path=LAST_FETCHED_FILE):
+    try:
+        with open(path, 'r') as f:
+            return float(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+# Publish a new refresh timestamp atomically
+def write_last_fetched(path=LAST_FETCHED_FILE, timestamp=None):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(str(time.time() if timestamp is None else timestamp))
+    os.replace(tmp_path, path)
+
+
+# Keeps the on-disk NBA data fresh without blocking web requests.
+# Requests keep reading the current files while a single background worker
+# rebuilds them. The fetched datasets are published as a new snapshot by
+# swapping snapshots/CURRENT atomically, so readers see either the old or the
+# new snapshot, never a mix; the new timestamp is published last.
+class DataRefresher:
+    def __init__(self, refresh=refresh_nba_data, max_age=MAX_DATA_AGE,
+                 stamp_file=LAST_FETCHED_FILE, lock_file=REFRESH_LOCK_FILE):
+        self.refresh = refresh
+        self.max_age = max_age
+        self.stamp_file = stamp_file
+        self.lock_file = lock_file
+        self._lock = threading.Lock()
+        self._thread = None
+        self.last_summary = None
+        self.last_error = None
+        self.last_started = None
+        self.last_finished = None
+
+    def is_stale(self):
+        last_fetched = read_last_fetched(self.stamp_file)
+        return last_fetched is None or (time.time() - last_fetched) >= self.max_age
+
+    def is_refreshing(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # Start a background refresh unless one is already running. Returns True if started.
+    def trigger(self):
+        with self._lock:
+            if self.is_refreshing():
+                return False
+            # The lock file keeps separate worker processes from refreshing at the same time
+            if not acquire_file_lock(self.lock_file):
+                logging.info("NBA data refresh already running in another worker.")
+                return False
+            self.last_started = time.time()
+            self._thread = threading.Thread(target=self._run, name='nba-refresh', daemon=True)
+            self._thread.start()
+            return True
+
+    # Called on each request: kick off a refresh if the data is stale, never wait for it
+    def ensure_fresh(self):
+        if self.is_stale():
+            return self.trigger()
+        return False
+
+    # Block until the running refresh (if any) completes; used by scripts and tests
+    def wait(self, timeout=None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def status(self):
+        last_fetched = read_last_fetched(self.stamp_file)
+        return {
+            'last_fetched': last_fetched,
+            'age_seconds': None if last_fetched is None else time.time() - last_fetched,
+            'stale': self.is_stale(),
+            'refreshing': self.is_refreshing(),
+            'last_started': self.last_started,
+            'last_finished': self.last_finished,
+            'last_summary': self.last_summary,
+            'last_error': self.last_error,
+        }
+
+    def _run(self):
+        try:
+            logging.info("Refreshing NBA data in the background...")
+            summary = self.refresh()
+            self.last_summary = summary
+            self.last_error = None
+            # Keep the old timestamp if every source failed so the next request retries
+            if summary is None or any(result['status'] == 'ok' for result in summary.values()):
+                write_last_fetched(self.stamp_file)
+        except Exception as e:
+            self.last_error = str(e)
+            logging.error(f"Background NBA data refresh failed: {e}")
+        finally:
+            self.last_finished = time.time()
+            release_file_lock(self.lock_file)
@@ -0,0 +1,113 @@
+import os
+import time
+import logging
+import threading
+from fetch_nba_data import build_schedule_index
+from team_index import TeamIndex
+from tweet_matcher import TweetMatcher, TweetIndex
+from metrics import metrics
+from snapshot_io import DATASETS, SNAPSHOT_DIR, CURRENT_FILE, current_snapshot_id, read_dataset
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Files whose modification time identifies a snapshot version. The refresh pipeline
+# publishes snapshots/CURRENT after all datasets are written; last_fetched.txt is
+# written after that, so keying on it too would reload every refresh twice.
+VERSION_FILES = [os.path.join(SNAPSHOT_DIR, CURRENT_FILE)]
+# Tweets are saved separately and far more often, so they are versioned on their
+# own: a new tweets file only reloads the tweets and rebuilds the tweet index.
+TWEET_VERSION_FILES = ['tweets.csv']
+
+
+# Version key of the data currently on disk
+def current_version(data_dir='.', files=VERSION_FILES):
+    version = []
+    for name in files:
+        try:
+            version.append(os.stat(os.path.join(data_dir, name)).st_mtime_ns)
+        except OSError:
+            version.append(None)
+    return tuple(version)
+
+
+# An immutable, fully loaded view of the NBA datasets. Consumers must treat the
+# frames as read-only; a refresh produces a new snapshot rather than mutating this one.
+# `version` covers both the published datasets and the tweets.
+class DataSnapshot:
+    __slots__ = ('version', 'data_version', 'tweets_version', 'loaded_at', 'team_stats', 'player_stats',
+                 'injuries', 'tweets', 'schedule', 'schedule_index', 'team_index', 'tweet_matcher', 'tweet_index')
+
+    # `base` is a snapshot of the same published datasets whose indexes are reused
+    def __init__(self, data_version, tweets_version, frames, base=None):
+        set_attr = object.__setattr__
+        set_attr(self, 'data_version', data_version)
+        set_attr(self, 'tweets_version', tweets_version)
+        set_attr(self, 'version', data_version + tweets_version)
+        set_attr(self, 'loaded_at', time.time())
+        for name in DATASETS:
+            set_attr(self, name, frames[name])
+        if base is None:
+            set_attr(self, 'schedule_index', build_schedule_index(frames['schedule']))
+            set_attr(self, 'team_index', TeamIndex(frames['team_stats'], frames['player_stats'], frames['injuries']))
+            set_attr(self, 'tweet_matcher', TweetMatcher(self.team_index))
+        else:
+            for name in ('schedule_index', 'team_index', 'tweet_matcher'):
+                set_attr(self, name, getattr(base, name))
+        set_attr(self, 'tweet_index', TweetIndex(frames['tweets'], self.tweet_matcher))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DataSnapshot is immutable")
+
+    @classmethod
+    def load(cls, data_dir='.'):
+        data_version = current_version(data_dir)
+        tweets_version = current_version(data_dir, TWEET_VERSION_FILES)
+        snapshot_id = current_snapshot_id(data_dir)
+        frames = {name: read_dataset(name, data_dir, snapshot_id) for name in DATASETS}
+        return cls(data_version, tweets_version, frames)
+
+    # This snapshot with the tweets read again; every other dataset and index is shared
+    def with_tweets(self, data_dir='.'):
+        tweets_version = current_version(data_dir, TWEET_VERSION_FILES)
+        frames = {name: getattr(self, name) for name in DATASETS}
+        frames['tweets'] = read_dataset('tweets', data_dir)
+        return DataSnapshot(self.data_version, tweets_version, frames, base=self)
+
+
+# Process-wide holder of the current snapshot. get() is a cheap stat() of the
+# version files; datasets are read again only after a new version is published,
+# and a tweets-only change reloads just the tweets.
+class SnapshotStore:
+    def __init__(self, data_dir='.'):
+        self.data_dir = data_dir
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        snapshot = self._snapshot
+        data_version = current_version(self.data_dir)
+        tweets_version = current_version(self.data_dir, TWEET_VERSION_FILES)
+        if snapshot is not None and snapshot.version == data_version + tweets_version:
+            return snapshot
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.data_version != data_version:
+                start = time.perf_counter()
+                with metrics.span('load_snapshot'):
+                    self._snapshot = DataSnapshot.load(self.data_dir)
+                logging.info(f"Loaded data snapshot {data_version} in {time.perf_counter() - start:.3f}s.")
+            elif snapshot.tweets_version != tweets_version:
+                start = time.perf_counter()
+                with metrics.span('load_tweets'):
+                    self._snapshot = snapshot.with_tweets(self.data_dir)
+                logging.info(f"Reloaded tweets {tweets_version} in {time.perf_counter() - start:.3f}s.")
+            return self._snapshot
+
+
+_store = SnapshotStore()
+
+# Current data snapshot shared by every request in this process
+def get_snapshot():
+    return _store.get()
@@ -1,27 +1,21 @@
 import pandas as pd
-from nba_api.stats.endpoints import leaguegamelog, leaguedashteamstats, leaguedashplayerstats, teamgamelog, ScoreboardV2
-from nba_api.stats.static import teams
 import os
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-
-
-# Disable SSL verification for NBA API
-os.environ['NBA_API_SSL_VERIFY'] = 'false'
+from snapshot_io import write_snapshot, atomic_to_csv
+from http_cache import ConditionalGet
+from nba_transport import install_transport
+from metrics import metrics
+from config import Lazy
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Helper function to get team ID by name
-def get_team_id(team_name):
-    nba_teams = teams.get_teams()
-    matching_teams = [team for team in nba_teams if team['full_name'].lower() == team_name.lower()]
-    if not matching_teams:
-        raise ValueError(f"Team '{team_name}' not found.")
-    return matching_teams[0]['id']
+# nba_api.stats.endpoints (every endpoint module) and BeautifulSoup are imported by
+# the fetchers that use them, so modules that only need the helpers here import quickly
 
 # Helper function to get the current NBA season
 def get_current_season():
@@ -33,6 +27,12 @@ def get_current_season():
     else:
         return f"{year - 1}-{str(year)[-2:]}"
 
+# Shared pooled, rate-limited and cached transport for all stats.nba.com calls.
+# It holds a connection pool, so it is installed by the first fetch in each process
+# (never at import, e.g. in the master of a pre-forking server); every function
+# that calls an nba_api endpoint resolves it first.
+nba_transport = Lazy(lambda: install_transport(current_season=get_current_season))
+
 # Fetch NBA schedule for the current season
 # def fetch_nba_schedule():
 
@@ -69,7 +69,17 @@ def get_current_season():
 #     except Exception as e:
 #         logging.error(f"Error fetching NBA schedule: {e}")
 
-def fetch_nba_schedule():
+SCHEDULE_LOOKAHEAD_DAYS = 14
+SCHEDULE_COLUMNS = ['Game Date', 'Game ID', 'Home Team', 'Away Team']
+
+# Fetch the NBA schedule for today and the next SCHEDULE_LOOKAHEAD_DAYS days.
+# The scoreboards for every day in the window are requested concurrently and
+# all games are kept, so schedule.csv holds the full multi-day slate.
+def fetch_nba_schedule(lookahead_days=SCHEDULE_LOOKAHEAD_DAYS, max_workers=5):
+    from nba_api.stats.endpoints import ScoreboardV2
+    from nba_api.stats.static import teams
+    nba_transport.resolve()
+
     # Fetch team names and IDs
     team_data = teams.get_teams()
     team_id_to_name = {team['id']: team['full_name'] for team in team_data}
@@ -81,119 +91,138 @@ def fetch_nba_schedule():
             return games
         except Exception as e:
             logging.warning(f"Failed to fetch games for {date_str}: {e}")
-            return pd.DataFrame()
+            return None
 
     try:
-        logging.info("Fetching NBA schedule...")
-        game_list = []
+        logging.info(f"Fetching NBA schedule for the next {lookahead_days} days...")
         today = datetime.now()
+        dates = [(today + pd.Timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(lookahead_days + 1)]
 
-        games = get_games_for_date(today.strftime('%Y-%m-%d'))
-
-        # If no games today, search up to 14 days ahead
-        lookahead_days = 0
-        while games.empty and lookahead_days < 14:
-            lookahead_days += 1
-            next_day = today + pd.Timedelta(days=lookahead_days)
-            logging.info(f"No games today. Checking {next_day.strftime('%Y-%m-%d')}...")
-            games = get_games_for_date(next_day.strftime('%Y-%m-%d'))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='nba-schedule') as executor:
+            games_by_date = list(executor.map(get_games_for_date, dates))
 
-        if games.empty:
-            logging.warning("No upcoming games found in the next 14 days.")
-        else:
-            for _, game in games.iterrows():
-                game_date = game['GAME_DATE_EST'].split('T')[0]
-                home_team = team_id_to_name.get(game['HOME_TEAM_ID'], "Unknown Team")
-                away_team = team_id_to_name.get(game['VISITOR_TEAM_ID'], "Unknown Team")
+        failed = sum(games is None for games in games_by_date)
+        if failed == len(dates):
+            raise RuntimeError(f"Could not fetch the scoreboard for any of the {len(dates)} days.")
+        if failed:
+            logging.warning(f"Scoreboards for {failed} of {len(dates)} days failed; their games are missing.")
 
+        game_list = []
+        for games in games_by_date:
+            if games is None:
+                continue
+            for game in games.to_dict('records'):
                 game_list.append({
-                    'Game Date': game_date,
-                    'Home Team': home_team,
-                    'Away Team': away_team
+                    'Game Date': game['GAME_DATE_EST'].split('T')[0],
+                    'Game ID': game['GAME_ID'],
+                    'Home Team': team_id_to_name.get(game['HOME_TEAM_ID'], "Unknown Team"),
+                    'Away Team': team_id_to_name.get(game['VISITOR_TEAM_ID'], "Unknown Team")
                 })
 
-            pd.DataFrame(game_list).to_csv('schedule.csv', index=False)
-            logging.info(f"NBA schedule saved to 'schedule.csv' with games on {game_date}.")
+        if not game_list:
+            # Keep the previous schedule rather than publishing an empty one
+            logging.warning(f"No upcoming games found in the next {lookahead_days} days.")
+            return None
+
+        schedule = pd.DataFrame(game_list, columns=SCHEDULE_COLUMNS)
+        schedule = schedule.drop_duplicates('Game ID').sort_values(['Game Date', 'Game ID'])
+        logging.info(f"Fetched NBA schedule with {len(schedule)} games "
+                     f"from {schedule['Game Date'].iloc[0]} to {schedule['Game Date'].iloc[-1]}.")
+        return schedule
 
     except Exception as e:
         logging.error(f"Error fetching NBA schedule: {e}")
+        raise
+
+# Index the schedule by date, by team and by matchup (unordered team pair).
+# Team names are stripped and lower-cased so lookups match the web form values.
+def build_schedule_index(schedule):
+    index = {'by_date': {}, 'by_team': {}, 'by_matchup': {}}
+    for game in schedule.to_dict('records'):
+        home = str(game['Home Team']).strip().lower()
+        away = str(game['Away Team']).strip().lower()
+        index['by_date'].setdefault(game['Game Date'], []).append(game)
+        index['by_team'].setdefault(home, []).append(game)
+        index['by_team'].setdefault(away, []).append(game)
+        index['by_matchup'].setdefault(frozenset((home, away)), []).append(game)
+    return index
+
+# Upcoming games between two teams, in date order
+def find_matchup_games(schedule_index, team1, team2):
+    key = frozenset((team1.strip().lower(), team2.strip().lower()))
+    return schedule_index['by_matchup'].get(key, [])
 
 
 # Fetch all team stats for the current season
 def fetch_all_team_stats():
+    from nba_api.stats.endpoints import leaguedashteamstats
+    nba_transport.resolve()
     try:
         logging.info("Fetching all team stats...")
         season = get_current_season()
         team_stats = leaguedashteamstats.LeagueDashTeamStats(season=season).get_data_frames()[0]
-        team_stats.to_csv('all_team_stats.csv', index=False)
-        logging.info("All team stats saved to 'all_team_stats.csv'.")
+        logging.info(f"Fetched stats for {len(team_stats)} teams.")
+        return team_stats
     except Exception as e:
         logging.error(f"Error fetching team stats: {e}")
+        raise
 
 # Fetch all player stats for the current season
 def fetch_all_player_stats():
+    from nba_api.stats.endpoints import leaguedashplayerstats
+    nba_transport.resolve()
     try:
         logging.info("Fetching all player stats...")
         season = get_current_season()
         player_stats = leaguedashplayerstats.LeagueDashPlayerStats(season=season).get_data_frames()[0]
-        player_stats.to_csv('all_player_stats.csv', index=False)
-        logging.info("All player stats saved to 'all_player_stats.csv'.")
+        logging.info(f"Fetched stats for {len(player_stats)} players.")
+        return player_stats
     except Exception as e:
         logging.error(f"Error fetching player stats: {e}")
-
-# Fetch last 3 games stats for a specific team (including regular season and playoffs)
-def fetch_last_3_games_stats(team):
-    try:
-        logging.info(f"Fetching last 3 games (including playoffs) for {team}...")
-        team_id = get_team_id(team)
-        season = get_current_season()
-
-        # Fetch both regular season and playoff game logs
-        regular_season_log = teamgamelog.TeamGameLog(
+        raise
+
+# Fetch a team's game log for a season (regular season and playoffs), newest first.
+# With date_from (a date), only games on or after that day are requested.
+def fetch_team_game_log(team_id, season, date_from=None):
+    from nba_api.stats.endpoints import teamgamelog
+    nba_transport.resolve()
+    date_from = date_from.strftime('%m/%d/%Y') if date_from is not None else ''
+    logs = [
+        teamgamelog.TeamGameLog(
             team_id=team_id,
             season=season,
-            season_type_all_star="Regular Season"
+            season_type_all_star=season_type,
+            date_from_nullable=date_from
         ).get_data_frames()[0]
+        for season_type in ("Regular Season", "Playoffs")
+    ]
 
-        playoff_log = teamgamelog.TeamGameLog(
-            team_id=team_id,
-            season=season,
-            season_type_all_star="Playoffs"
-        ).get_data_frames()[0]
+    # Combine both logs
+    all_games = pd.concat(logs, ignore_index=True)
 
-        # Combine both logs
-        all_games = pd.concat([regular_season_log, playoff_log], ignore_index=True)
+    # Convert GAME_DATE to datetime and sort
+    all_games['GAME_DATE'] = pd.to_datetime(all_games['GAME_DATE'], format='mixed')
+    return all_games.sort_values('GAME_DATE', ascending=False, kind='stable').reset_index(drop=True)
 
-        # Convert GAME_DATE to datetime and sort
-        all_games['GAME_DATE'] = pd.to_datetime(all_games['GAME_DATE'])
-        all_games = all_games.sort_values('GAME_DATE', ascending=False)
 
-        return all_games.head(3)
-    except Exception as e:
-        logging.error(f"Error fetching last 3 games stats for {team}: {e}")
-        return pd.DataFrame()
+INJURY_COLUMNS = ['Team', 'Player', 'Position', 'Estimated Return', 'Status']
+INJURY_CHANGES_FILE = 'injury_changes.csv'  # Latest status diff, next to the cached page
 
+# ESPN injuries page, fetched with ETag/If-Modified-Since and parsed only when its content changes
+injuries_page = ConditionalGet('injuries')
 
-def fetch_nba_injuries():
-    url = "https://www.espn.com/nba/injuries"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36"
-    }
-
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        logging.error(f"⚠️ Request error: {e}")
-        return
-
-    soup = BeautifulSoup(response.text, 'html.parser')
+# Injury rows from the ESPN injuries page. Only the per-team injury tables are
+# turned into a tree (SoupStrainer); the rest of the page is skipped while parsing.
+def parse_injuries(html):
+    from bs4 import BeautifulSoup, SoupStrainer
+    tables = SoupStrainer('div', class_='ResponsiveTable Table__league-injuries')
+    soup = BeautifulSoup(html, 'html.parser', parse_only=tables)
     injury_data = []
 
     teams = soup.find_all('div', class_='ResponsiveTable Table__league-injuries')
     if not teams:
         logging.error("⚠️ No teams found — check if ESPN changed the HTML structure.")
-        return
+        raise ValueError("No injury tables found in ESPN page.")
 
     for team in teams:
         team_name_tag = team.find('span', class_='injuries__teamName')
@@ -209,17 +238,100 @@ def fetch_nba_injuries():
                 status = columns[3].text.strip()
                 injury_data.append([team_name, name, position, estimated_return, status])
 
-    # Convert to DataFrame
-    df = pd.DataFrame(injury_data, columns=['Team', 'Player', 'Position', 'Estimated Return', 'Status'])
-    df.to_csv('nba_injuries.csv', index=False)
-    logging.info("NBA injuries data saved to 'nba_injuries.csv'.")
-
-# Save all NBA data
-def save_all_nba_data():
-    fetch_nba_schedule()
-    fetch_all_team_stats()
-    fetch_all_player_stats()
-    fetch_nba_injuries()
+    return pd.DataFrame(injury_data, columns=INJURY_COLUMNS)
+
+# Players whose status changed between two injury reports. Newly listed players
+# have no Old Status; players dropped from the report have no New Status.
+def injury_status_changes(previous, current):
+    keys = ['Team', 'Player']
+    merged = previous[keys + ['Status']].merge(current[keys + ['Status']], on=keys, how='outer',
+                                               suffixes=(' Old', ' New'))
+    merged = merged.rename(columns={'Status Old': 'Old Status', 'Status New': 'New Status'})
+    merged[['Old Status', 'New Status']] = merged[['Old Status', 'New Status']].fillna('')
+    changed = merged['Old Status'] != merged['New Status']
+    return merged[changed].sort_values(keys).reset_index(drop=True)
+
+def fetch_nba_injuries(url="https://www.espn.com/nba/injuries", page=None):
+    page = page or injuries_page
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36"
+    }
+
+    try:
+        response = page.get(url, headers=headers, timeout=10)
+    except requests.exceptions.RequestException as e:
+        logging.error(f"⚠️ Request error: {e}")
+        raise
+
+    df, previous = page.parse(response, parse_injuries)
+    if previous is not None and previous is not df:
+        changes = injury_status_changes(previous, df)
+        if not changes.empty:
+            atomic_to_csv(changes, os.path.join(page.directory, INJURY_CHANGES_FILE))
+            for change in changes.head(10).to_dict('records'):
+                logging.info(f"Injury status change: {change['Player']} ({change['Team']}): "
+                             f"{change['Old Status'] or 'not listed'} -> {change['New Status'] or 'not listed'}")
+        logging.info(f"{len(changes)} injury status changes since the last report.")
+    logging.info(f"Fetched {len(df)} NBA injury reports{'' if response.changed else ' (page unchanged)'}.")
+    return df
+
+# Independent data sources refreshed by save_all_nba_data, with per-source timeouts in seconds
+DATA_SOURCES = {
+    'schedule': (fetch_nba_schedule, 120),
+    'team_stats': (fetch_all_team_stats, 60),
+    'player_stats': (fetch_all_player_stats, 60),
+    'injuries': (fetch_nba_injuries, 30),
+}
+
+# Run a single fetcher and record its outcome, timing and fetched frame
+def _run_source(name, fetcher):
+    start = time.perf_counter()
+    try:
+        with metrics.span('fetch', source=name):
+            df = fetcher()
+        return {'status': 'ok', 'seconds': time.perf_counter() - start, 'error': None}, df
+    except Exception as e:
+        metrics.count('upstream_errors_total', source=name)
+        return {'status': 'error', 'seconds': time.perf_counter() - start, 'error': str(e)}, None
+
+# Save all NBA data, running the independent fetchers concurrently.
+# `sources` maps a name to (fetcher, timeout) and defaults to DATA_SOURCES, so
+# stub fetchers can be plugged in. The fetched frames are published as a new
+# binary snapshot (with CSV copies when write_csv is set); sources that failed
+# are carried forward from the previous snapshot. Returns a summary dict keyed by source name.
+def save_all_nba_data(sources=None, write_csv=True):
+    sources = DATA_SOURCES if sources is None else sources
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=len(sources) or 1, thread_name_prefix='nba-fetch')
+    futures = {name: executor.submit(_run_source, name, fetcher) for name, (fetcher, _) in sources.items()}
+
+    summary = {}
+    frames = {}
+    try:
+        for name, (_, timeout) in sources.items():
+            remaining = timeout - (time.perf_counter() - start)
+            done, _ = wait([futures[name]], timeout=max(remaining, 0))
+            if done:
+                summary[name], frames[name] = futures[name].result()
+            else:
+                summary[name] = {'status': 'timeout', 'seconds': time.perf_counter() - start,
+                                 'error': f"no response within {timeout}s"}
+    finally:
+        # Timed-out fetchers keep running in the background; don't block on them
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if any(df is not None for df in frames.values()):
+        write_snapshot(frames, write_csv=write_csv)
+
+    elapsed = time.perf_counter() - start
+    failed = [name for name, result in summary.items() if result['status'] != 'ok']
+    for name, result in summary.items():
+        logging.info(f"{name}: {result['status']} in {result['seconds']:.2f}s")
+    if failed:
+        logging.warning(f"NBA data refresh finished in {elapsed:.2f}s with failures: {', '.join(failed)}")
+    else:
+        logging.info(f"NBA data refresh finished in {elapsed:.2f}s.")
+    return summary
 
 # Run the function to fetch and save all data
 if __name__ == "__main__":
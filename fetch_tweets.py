@@ -1,72 +1,226 @@
-import tweepy
+import requests
 import pandas as pd
+import os
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from rate_limit import TokenBucket
+from snapshot_io import atomic_to_csv
+from file_lock import acquire_file_lock, release_file_lock
+from metrics import metrics
+from config import Lazy, get_config
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Load API keys
-with open('keys.json') as f:
-    keys = json.load(f)
+TWEETS_FILE = 'tweets.csv'
+STATE_FILE = 'tweet_state.json'  # Cached username -> user ID, per-user since_id and the last run
+LOCK_FILE = 'tweets.lock'  # Held by the process that is ingesting
+LOCK_EXPIRY = 900  # Treat a lock file older than this as left behind by a dead process
+TWEET_COLUMNS = ['Tweet ID', 'Username', 'Tweet', 'Created At']
+LOOKBACK_DAYS = 3  # Tweets older than this are dropped
+MAX_WORKERS = 4
+MIN_INTERVAL = 300  # Seconds between background ingestion runs
 
-# Authenticate with Twitter API
-client = tweepy.Client(bearer_token=keys['TWITTER_BEARER_TOKEN'])
+# Default request budgets (requests per 15-minute window) until the API's headers say otherwise
+USER_LOOKUP_LIMIT = 300
+USER_TWEETS_LIMIT = 1500
+RATE_WINDOW = 900
 
-def save_tweets(team1, team2, players):
-    try:
-        with open('usernames.txt', 'r') as f:
-            usernames = f.read().splitlines()
 
-        tweets_data = []
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=3)
+# Authenticate with Twitter API. Raw responses give us the rate-limit headers.
+def twitter_client(config=None):
+    import tweepy
+    config = get_config() if config is None else config
+    return tweepy.Client(bearer_token=config['TWITTER_BEARER_TOKEN'], return_type=requests.Response)
 
-        # Format timestamps correctly (RFC3339 format)
-        start_time = start_date.strftime('%Y-%m-%dT%H:%M:%SZ')
-        end_time = end_date.strftime('%Y-%m-%dT%H:%M:%SZ')
 
-        for username in usernames:
+# Incremental, rate-limit-aware tweet ingestion. User IDs are looked up once and
+# cached with each user's newest tweet ID, so later runs only ask for newer tweets
+# (since_id). Fetches run concurrently, each endpoint drawing from a token bucket
+# that pauses until the window resets when the API reports it is exhausted.
+# One process ingests at a time (a lock file), and the state file records the
+# last run, so web workers share one API budget rather than each spending their own.
+# `client` is anything with tweepy.Client's get_user/get_users_tweets returning
+# raw responses (.json() and .headers), so a fake client can stand in for tests.
+class TweetIngestor:
+    def __init__(self, client, usernames_file='usernames.txt', tweets_file=TWEETS_FILE,
+                 state_file=STATE_FILE, lock_file=LOCK_FILE, max_workers=MAX_WORKERS, min_interval=MIN_INTERVAL):
+        self.client = client
+        self.usernames_file = usernames_file
+        self.tweets_file = tweets_file
+        self.state_file = state_file
+        self.lock_file = lock_file
+        self.max_workers = max_workers
+        self.min_interval = min_interval
+        self.user_lookup_bucket = TokenBucket(USER_LOOKUP_LIMIT / RATE_WINDOW, capacity=max_workers)
+        self.user_tweets_bucket = TokenBucket(USER_TWEETS_LIMIT / RATE_WINDOW, capacity=max_workers)
+        self._state_lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._thread = None
+        self.last_run = None
+        self.last_summary = None
+        self.state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        state.setdefault('user_ids', {})
+        state.setdefault('since_ids', {})
+        return state
+
+    def _save_state(self):
+        tmp_path = f"{self.state_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._state_lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.state_file)
+
+    # Call the API through a bucket and follow the rate-limit headers of the reply
+    def _call(self, bucket, method, **params):
+        import tweepy
+        for attempt in range(2):
+            bucket.acquire()
             try:
-                user = client.get_user(username=username)
-                user_id = user.data.id
-                tweets = client.get_users_tweets(
-                    id=user_id,
-                    max_results=5,  # Fetch up to 5 tweets
-                    start_time=start_time,
-                    end_time=end_time,
-                    tweet_fields=["created_at", "text"]
-                )
-                if tweets and tweets.data:
-                    # Take the first tweet, even if it's not relevant
-                    first_tweet = tweets.data[0]
-                    tweets_data.append({
-                        'Username': username,
-                        'Tweet': first_tweet.text,
-                        'Created At': first_tweet.created_at.isoformat()  # Convert datetime to string
-                    })
-                    logging.info(f"Found tweet from {username}: {first_tweet.text}")
-                    break  # Stop after finding the first tweet
-                # Add a delay to avoid hitting rate limits
-                time.sleep(2)  # 2-second delay between requests
+                response = method(**params)
             except tweepy.TooManyRequests as e:
-                logging.error(f"Rate limit exceeded. Skipping tweet fetching.")
-                return  # Bypass tweet fetching entirely
-            except Exception as e:
-                logging.error(f"Error fetching tweets for {username}: {e}")
+                reset = int(e.response.headers.get('x-rate-limit-reset', time.time() + RATE_WINDOW))
+                logging.warning(f"Twitter rate limit hit; pausing until {datetime.fromtimestamp(reset)}.")
+                bucket.pause_until(reset)
+                if attempt:
+                    raise
                 continue
+            if response.headers.get('x-rate-limit-remaining') == '0':
+                bucket.pause_until(int(response.headers.get('x-rate-limit-reset', time.time() + RATE_WINDOW)))
+            return response.json()
 
-        # Save the first tweet to CSV
-        if tweets_data:
-            pd.DataFrame(tweets_data).to_csv('tweets.csv', index=False)
-            logging.info("Tweet saved to 'tweets.csv'.")
+    def _user_id(self, username):
+        with self._state_lock:
+            user_id = self.state['user_ids'].get(username.lower())
+        if user_id is None:
+            user_id = self._call(self.user_lookup_bucket, self.client.get_user, username=username)['data']['id']
+            with self._state_lock:
+                self.state['user_ids'][username.lower()] = user_id
+        return user_id
+
+    # New tweets for one user since the last run (or within the lookback window)
+    def _fetch_user(self, username, start_time):
+        user_id = self._user_id(username)
+        with self._state_lock:
+            since_id = self.state['since_ids'].get(username.lower())
+        params = {'id': user_id, 'max_results': 100, 'tweet_fields': ["created_at", "text"]}
+        if since_id:
+            params['since_id'] = since_id
         else:
-            logging.warning("No tweets found.")
-    except Exception as e:
-        logging.error(f"Error fetching tweets: {e}")
+            params['start_time'] = start_time
+        result = self._call(self.user_tweets_bucket, self.client.get_users_tweets, **params)
+
+        tweets = result.get('data') or []
+        newest_id = result.get('meta', {}).get('newest_id')
+        if newest_id:
+            with self._state_lock:
+                self.state['since_ids'][username.lower()] = newest_id
+        return [{'Tweet ID': tweet['id'], 'Username': username, 'Tweet': tweet['text'],
+                 'Created At': tweet['created_at']} for tweet in tweets]
+
+    # Fetch new tweets for every tracked user and merge them into tweets.csv.
+    # Returns a summary of how many tweets were added and which users failed, or
+    # None without fetching if another process (or thread) is ingesting, or if any
+    # process ingested less than min_interval seconds ago.
+    def ingest(self, min_interval=0):
+        if not acquire_file_lock(self.lock_file, LOCK_EXPIRY):
+            logging.info("Tweet ingestion already running in another worker.")
+            self.last_run = time.time()
+            return None
+        try:
+            # Another process may have ingested since this one last read the state
+            state = self._load_state()
+            with self._state_lock:
+                self.state = state
+            last_run = state.get('last_run')
+            if last_run is not None and time.time() - last_run < min_interval:
+                self.last_run = last_run
+                return None
+            return self._ingest()
+        finally:
+            release_file_lock(self.lock_file)
+
+    def _ingest(self):
+        with open(self.usernames_file, 'r') as f:
+            usernames = [line.strip() for line in f if line.strip()]
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(days=LOOKBACK_DAYS)
+        start_time = cutoff.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        new_tweets, failed = [], []
+
+        def fetch(username):
+            try:
+                with metrics.span('fetch', source='tweets'):
+                    return self._fetch_user(username, start_time)
+            except Exception as e:
+                metrics.count('upstream_errors_total', source='twitter')
+                logging.error(f"Error fetching tweets for {username}: {e}")
+                failed.append(username)
+                return []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='tweets') as executor:
+            for tweets in executor.map(fetch, usernames):
+                new_tweets.extend(tweets)
+        with self._state_lock:
+            self.state['last_run'] = time.time()
+        self._save_state()
+
+        existing = pd.DataFrame(columns=TWEET_COLUMNS)
+        if os.path.exists(self.tweets_file):
+            existing = pd.read_csv(self.tweets_file, dtype=str).reindex(columns=TWEET_COLUMNS)
+        if new_tweets or len(existing):
+            tweets = pd.concat([existing, pd.DataFrame(new_tweets, columns=TWEET_COLUMNS)], ignore_index=True)
+            created = pd.to_datetime(tweets['Created At'], utc=True, errors='coerce', format='mixed')
+            tweets = (tweets[created >= cutoff]
+                      .drop_duplicates(subset=['Tweet ID', 'Username', 'Tweet'], keep='last')
+                      .sort_values('Created At', ascending=False))
+            # Only rewrite the file (and so publish a new snapshot) when something changed
+            if new_tweets or len(tweets) != len(existing):
+                atomic_to_csv(tweets, self.tweets_file)
+                logging.info(f"Saved {len(tweets)} tweets ({len(new_tweets)} new) to '{self.tweets_file}'.")
+
+        self.last_run = time.time()
+        self.last_summary = {'users': len(usernames), 'new_tweets': len(new_tweets), 'failed': failed}
+        return self.last_summary
+
+    # Start ingestion in a background thread unless one is running or the last run was recent
+    def trigger(self):
+        with self._run_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            if self.last_run is not None and time.time() - self.last_run < self.min_interval:
+                return False
+            self._thread = threading.Thread(target=self._run, name='tweet-ingest', daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self):
+        try:
+            self.ingest(self.min_interval)
+        except Exception as e:
+            self.last_run = time.time()
+            logging.error(f"Error fetching tweets: {e}")
+
 
+# Built with the configured bearer token on first use, so importing this module reads no files
+tweet_ingestor = Lazy(lambda: TweetIngestor(twitter_client()))
 
+# Fetch new tweets now, in the calling thread
+def save_tweets():
+    return tweet_ingestor.ingest()
 
 
+if __name__ == '__main__':
+    print(save_tweets())
@@ -0,0 +1,28 @@
+import os
+import time
+
+LOCK_EXPIRY = 1800  # Treat a lock file older than this as left behind by a dead process
+
+
+# Lock shared by every process on the machine: the lock file is created exclusively
+# and holds the owner's PID. Returns False while another holder has it, even in this process.
+def acquire_file_lock(path, expiry=LOCK_EXPIRY):
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            if time.time() - os.path.getmtime(path) < expiry:
+                return False
+            os.remove(path)
+        except OSError:
+            return False
+        return acquire_file_lock(path, expiry)
+    with os.fdopen(fd, 'w') as f:
+        f.write(str(os.getpid()))
+    return True
+
+def release_file_lock(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
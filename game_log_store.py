@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+import pandas as pd
+from fetch_nba_data import fetch_team_game_log, get_current_season
+from team_index import get_team_id
+from metrics import metrics
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+GAME_LOG_DIR = 'game_logs'
+MIN_CHECK_INTERVAL = 3 * 3600  # Never ask nba_api about a team more often than this
+FORM_COLUMNS = ['PTS', 'FG_PCT', 'FG3_PCT', 'REB', 'AST', 'TOV']
+
+
+# Persistent per-team game logs for the current season. Each team's log is kept
+# in game_logs/<season>/<team_id>.feather together with when it was last checked.
+# update() only asks nba_api for games on or after the last stored GAME_DATE,
+# and skips the call entirely when the team can't have played since the last check.
+# The files are shared by worker processes: each update re-reads the team's meta
+# file, so a fetch made by another worker counts as this worker's last check too.
+class GameLogStore:
+    def __init__(self, directory=GAME_LOG_DIR, min_check_interval=MIN_CHECK_INTERVAL,
+                 fetch=fetch_team_game_log):
+        self.directory = directory
+        self.min_check_interval = min_check_interval
+        self.fetch = fetch
+        self._logs = {}
+        self._meta = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.fetches = 0
+
+    def _paths(self, season, team_id):
+        base = os.path.join(self.directory, season)
+        return os.path.join(base, f"{team_id}.feather"), os.path.join(base, f"{team_id}.json")
+
+    def _lock(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    # Stored log and meta of a team. The meta file is read every time; the log is
+    # read again only when the meta shows it was updated, e.g. by another worker.
+    # The meta is written after the log, so a new meta never comes with an old log.
+    def _load(self, season, team_id):
+        key = (season, team_id)
+        log_path, meta_path = self._paths(season, team_id)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+        if meta is not None and (meta != self._meta.get(key) or self._logs.get(key) is None):
+            try:
+                self._logs[key] = pd.read_feather(log_path)
+                self._meta[key] = meta
+            except OSError as e:
+                logging.warning(f"Could not read game log '{log_path}': {e}")
+        return self._logs.get(key), self._meta.get(key)
+
+    def _save(self, season, team_id, log, meta):
+        log_path, meta_path = self._paths(season, team_id)
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        # Temp names are per process and thread so concurrent writers never share one
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        log.to_feather(f"{log_path}.{suffix}")
+        os.replace(f"{log_path}.{suffix}", log_path)
+        with open(f"{meta_path}.{suffix}", 'w') as f:
+            json.dump(meta, f)
+        os.replace(f"{meta_path}.{suffix}", meta_path)
+        self._logs[(season, team_id)] = log
+        self._meta[(season, team_id)] = meta
+
+    # Whether the team could have played since the last check. Uses the schedule
+    # index when it covers the day of the last check; otherwise falls back to the interval.
+    def _needs_check(self, team, meta, schedule_index):
+        if meta is None:
+            return True
+        if time.time() - meta['checked_at'] < self.min_check_interval:
+            return False
+        if schedule_index and schedule_index['by_date']:
+            checked_day = datetime.fromtimestamp(meta['checked_at']).strftime('%Y-%m-%d')
+            today = datetime.now().strftime('%Y-%m-%d')
+            if min(schedule_index['by_date']) <= checked_day:
+                games = schedule_index['by_team'].get(team.strip().lower(), [])
+                return any(checked_day <= game['Game Date'] <= today for game in games)
+        return True
+
+    # Team's full game log for the season, newest first, fetching only new games
+    def update(self, team, schedule_index=None):
+        team_id = get_team_id(team)
+        season = get_current_season()
+        with self._lock((season, team_id)):
+            log, meta = self._load(season, team_id)
+            if not self._needs_check(team, meta, schedule_index):
+                metrics.count('game_log_checks_total', result='skipped')
+                return log
+
+            date_from = None if log is None or log.empty else log['GAME_DATE'].max()
+            logging.info(f"Fetching {team} games since {date_from.date() if date_from is not None else 'season start'}...")
+            with metrics.span('fetch', source='team_game_log'):
+                new_games = self.fetch(team_id, season, date_from)
+            # Updates of different teams run concurrently; the counter is store-wide
+            with self._locks_guard:
+                self.fetches += 1
+            metrics.count('game_log_checks_total', result='fetched')
+
+            if log is not None and not new_games.empty:
+                combined = pd.concat([new_games, log], ignore_index=True)
+            else:
+                combined = new_games if log is None else log
+            combined = (combined.drop_duplicates('Game_ID', keep='first')
+                        .sort_values('GAME_DATE', ascending=False, kind='stable')
+                        .reset_index(drop=True))
+            self._save(season, team_id, combined, {'checked_at': time.time(), 'games': len(combined)})
+            return combined
+
+    def stats(self):
+        with self._locks_guard:
+            return {'fetches': self.fetches, 'teams': len(self._locks)}
+
+    # Most recent n games
+    def last_n(self, team, n=3, schedule_index=None):
+        return self.update(team, schedule_index).head(n)
+
+    # Averages and record over the last `window` games
+    def form(self, team, window=5, schedule_index=None):
+        recent = self.last_n(team, window, schedule_index)
+        summary = {'games': len(recent), 'wins': int((recent['WL'] == 'W').sum()), 'losses': int((recent['WL'] == 'L').sum())}
+        for column in FORM_COLUMNS:
+            if column in recent.columns and len(recent):
+                summary[column] = float(recent[column].mean())
+        return summary
+
+
+game_log_store = GameLogStore()
+
+# Fetch last 3 games stats for a specific team (including regular season and playoffs)
+def fetch_last_3_games_stats(team, schedule_index=None):
+    try:
+        return game_log_store.last_n(team, 3, schedule_index)
+    except Exception as e:
+        logging.error(f"Error fetching last 3 games stats for {team}: {e}")
+        return pd.DataFrame()
@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import requests
+import pandas as pd
+from metrics import metrics
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+HTTP_CACHE_DIR = 'http_cache'
+
+
+# Result of a conditional GET. `changed` is False when the server answered 304
+# or sent back a body with the same content hash as last time.
+class CachedResponse:
+    def __init__(self, text, content_hash, changed, status_code):
+        self.text = text
+        self.content_hash = content_hash
+        self.changed = changed
+        self.status_code = status_code
+
+
+# Conditional GET for one scraped page. The last body is kept in
+# http_cache/<name>.html with its ETag, Last-Modified and sha256 in <name>.json,
+# and the next request sends If-None-Match/If-Modified-Since. parse() keeps the
+# parsed frame of the last body in <name>.feather, so an unchanged page is never re-parsed.
+class ConditionalGet:
+    def __init__(self, name, directory=HTTP_CACHE_DIR, session=None):
+        self.name = name
+        self.directory = directory
+        self.session = session or requests.Session()
+        self._lock = threading.Lock()
+
+    def _path(self, extension):
+        return os.path.join(self.directory, f"{self.name}.{extension}")
+
+    def _read_meta(self):
+        try:
+            with open(self._path('json'), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(f"{self._path('json')}.tmp", 'w') as f:
+            json.dump(meta, f)
+        os.replace(f"{self._path('json')}.tmp", self._path('json'))
+
+    def _read_body(self):
+        try:
+            with open(self._path('html'), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def get(self, url, headers=None, timeout=10):
+        with self._lock:
+            meta = self._read_meta()
+            cached_body = self._read_body() if meta.get('url') == url else None
+            request_headers = dict(headers or {})
+            if cached_body is not None:
+                if meta.get('etag'):
+                    request_headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    request_headers['If-Modified-Since'] = meta['last_modified']
+
+            response = self.session.get(url, headers=request_headers, timeout=timeout)
+            if response.status_code == 304 and cached_body is not None:
+                meta['checked_at'] = time.time()
+                self._write_meta(meta)
+                logging.info(f"{self.name}: not modified since last fetch.")
+                metrics.count('http_cache_total', page=self.name, result='not_modified')
+                return CachedResponse(cached_body, meta['content_hash'], False, 304)
+            response.raise_for_status()
+
+            text = response.text
+            content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+            changed = cached_body is None or content_hash != meta.get('content_hash')
+            if changed:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(f"{self._path('html')}.tmp", 'w', encoding='utf-8') as f:
+                    f.write(text)
+                os.replace(f"{self._path('html')}.tmp", self._path('html'))
+            meta.update({
+                'url': url, 'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified'),
+                'content_hash': content_hash, 'checked_at': time.time(),
+            })
+            self._write_meta(meta)
+            metrics.count('http_cache_total', page=self.name, result='changed' if changed else 'unchanged')
+            return CachedResponse(text, content_hash, changed, response.status_code)
+
+    # Frame parsed from the last body, or None when it was parsed from different content
+    def previous_parse(self, content_hash=None):
+        meta = self._read_meta()
+        if not os.path.exists(self._path('feather')):
+            return None
+        if content_hash is not None and meta.get('parsed_hash') != content_hash:
+            return None
+        return pd.read_feather(self._path('feather'))
+
+    # parser(text) -> DataFrame, skipped when this exact content was parsed before.
+    # Returns (current, previous) where previous is the frame from the last different content.
+    def parse(self, response, parser):
+        with self._lock:
+            cached = self.previous_parse(response.content_hash)
+            if cached is not None:
+                return cached, cached
+            previous = self.previous_parse()
+            parsed = parser(response.text)
+            os.makedirs(self.directory, exist_ok=True)
+            parsed.reset_index(drop=True).to_feather(f"{self._path('feather')}.tmp")
+            os.replace(f"{self._path('feather')}.tmp", self._path('feather'))
+            meta = self._read_meta()
+            meta['parsed_hash'] = response.content_hash
+            self._write_meta(meta)
+            return parsed, previous
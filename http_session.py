@@ -0,0 +1,11 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# Build a requests session that keeps connections alive and reuses them across threads
+def pooled_session(pool_size=16):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
@@ -0,0 +1,252 @@
+import time
+import json
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from metrics import metrics
+from http_session import pooled_session
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+OPENAI_API_URL = "https://api.openai.com/v1/chat/completions"
+DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
+
+REQUEST_TIMEOUT = 60  # Seconds allowed for one HTTP attempt
+MAX_RETRIES = 2
+BACKOFF = 0.5  # Base delay in seconds, doubled per retry and jittered
+HEDGE_AFTER = 15  # Start the fallback provider if the primary hasn't answered by then
+DEADLINE = 90  # Overall budget for one chat() call
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    pass
+
+class _RetryableStatus(Exception):
+    pass
+
+
+# One OpenAI-compatible chat completions endpoint (OpenAI, DeepSeek, or a local mock server)
+class LLMProvider:
+    def __init__(self, name, url, api_key, model, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES,
+                 backoff=BACKOFF, session=None):
+        self.name = name
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.session = session or pooled_session()
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    # Send the prompt and return the reply text. Transient failures are retried
+    # with jittered exponential backoff as long as the deadline (a time.monotonic() value) allows.
+    def chat(self, prompt, deadline=None):
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            remaining = self.timeout if deadline is None else min(self.timeout, deadline - time.monotonic())
+            if remaining <= 0:
+                self._record(start, ok=False)
+                raise LLMError(f"{self.name}: deadline exceeded")
+            try:
+                text = self._post(prompt, remaining)
+                self._record(start, ok=True)
+                return text
+            except (requests.ConnectionError, requests.Timeout, _RetryableStatus) as e:
+                attempt += 1
+                delay = self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+                if attempt > self.max_retries or (deadline is not None and time.monotonic() + delay >= deadline):
+                    self._record(start, ok=False)
+                    raise LLMError(f"{self.name}: {e}") from e
+                logging.warning(f"{self.name} attempt {attempt} failed ({e}); retrying in {delay:.2f}s")
+                time.sleep(delay)
+            except Exception as e:
+                self._record(start, ok=False)
+                raise LLMError(f"{self.name}: {e}") from e
+
+    def _post(self, prompt, timeout):
+        response = self.session.post(
+            self.url,
+            headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+            json={"model": self.model, "messages": [{"role": "user", "content": prompt}]},
+            timeout=timeout,
+        )
+        if response.status_code in RETRY_STATUSES:
+            raise _RetryableStatus(f"HTTP {response.status_code}")
+        response.raise_for_status()
+        result = response.json()
+        try:
+            return result['choices'][0]['message']['content']
+        except (KeyError, IndexError) as e:
+            raise ValueError(f"Unexpected response: {result}") from e
+
+    # Yield the reply as it is generated (OpenAI-style server-sent events). Transient
+    # failures are retried like chat() as long as nothing has been yielded yet. The
+    # request timeout only bounds each socket read, so the deadline is also checked
+    # between chunks to stop a reply that keeps trickling in.
+    def stream(self, prompt, deadline=None):
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            remaining = self.timeout if deadline is None else min(self.timeout, deadline - time.monotonic())
+            if remaining <= 0:
+                self._record(start, ok=False)
+                raise LLMError(f"{self.name}: deadline exceeded")
+            started = False
+            try:
+                for delta in self._post_stream(prompt, remaining, deadline):
+                    started = True
+                    yield delta
+                self._record(start, ok=True)
+                return
+            except (requests.ConnectionError, requests.Timeout, _RetryableStatus) as e:
+                attempt += 1
+                delay = self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+                if started or attempt > self.max_retries or (deadline is not None and time.monotonic() + delay >= deadline):
+                    self._record(start, ok=False)
+                    raise LLMError(f"{self.name}: {e}") from e
+                logging.warning(f"{self.name} stream attempt {attempt} failed ({e}); retrying in {delay:.2f}s")
+                time.sleep(delay)
+            except Exception as e:
+                self._record(start, ok=False)
+                raise LLMError(f"{self.name}: {e}") from e
+
+    def _post_stream(self, prompt, timeout, deadline=None):
+        with self.session.post(
+            self.url,
+            headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+            json={"model": self.model, "messages": [{"role": "user", "content": prompt}], "stream": True},
+            timeout=timeout,
+            stream=True,
+        ) as response:
+            if response.status_code in RETRY_STATUSES:
+                raise _RetryableStatus(f"HTTP {response.status_code}")
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise requests.Timeout("deadline exceeded while streaming")
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    return
+                delta = json.loads(data)['choices'][0].get('delta', {}).get('content')
+                if delta:
+                    yield delta
+
+    def _record(self, start, ok):
+        metrics.observe('span_seconds', time.monotonic() - start, span='llm_call', provider=self.name)
+        if not ok:
+            metrics.count('upstream_errors_total', source=self.name)
+        with self._lock:
+            self.calls += 1
+            if ok:
+                self._latencies.append(time.monotonic() - start)
+            else:
+                self.errors += 1
+
+    # Call counts and latency percentiles (seconds) over recent successful calls
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            calls, errors = self.calls, self.errors
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else None
+        return {'calls': calls, 'errors': errors, 'p50': percentile(0.5), 'p95': percentile(0.95)}
+
+
+# Tries providers in order under one deadline. If the primary hasn't answered
+# within hedge_after seconds (or fails sooner), the next provider is fired too
+# and whichever answers first wins.
+class LLMClient:
+    def __init__(self, providers, hedge_after=HEDGE_AFTER, deadline=DEADLINE, max_workers=16):
+        if not providers:
+            raise ValueError("LLMClient needs at least one provider.")
+        self.providers = providers
+        self.hedge_after = hedge_after
+        self.deadline = deadline
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm')
+
+    # Returns (reply text, name of the provider that produced it)
+    def chat(self, prompt):
+        deadline = time.monotonic() + self.deadline
+        pending = {}
+        errors = []
+        next_provider = 0
+
+        def launch():
+            nonlocal next_provider
+            provider = self.providers[next_provider]
+            next_provider += 1
+            pending[self._executor.submit(provider.chat, prompt, deadline)] = provider
+
+        launch()
+        while pending:
+            can_hedge = next_provider < len(self.providers)
+            timeout = deadline - time.monotonic()
+            if can_hedge:
+                timeout = min(timeout, self.hedge_after)
+            done, _ = wait(pending, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    text = future.result()
+                    logging.info(f"Prediction generated using {provider.name}.")
+                    return text, provider.name
+                except Exception as e:
+                    logging.warning(f"{provider.name} failed: {e}")
+                    errors.append(str(e))
+
+            if time.monotonic() >= deadline:
+                break
+            # Fire the next provider if the current ones failed or are too slow
+            if can_hedge and (not done or not pending):
+                if done:
+                    logging.info(f"Falling back to {self.providers[next_provider].name}...")
+                else:
+                    logging.info(f"No answer after {self.hedge_after}s; hedging with {self.providers[next_provider].name}...")
+                launch()
+
+        raise LLMError(f"All providers failed: {'; '.join(errors) or 'deadline exceeded'}")
+
+    # Yield (text delta, provider name) pairs as the reply is generated. Streams are
+    # not hedged; a provider that fails before its first token hands over to the next one.
+    def stream(self, prompt):
+        deadline = time.monotonic() + self.deadline
+        errors = []
+        for provider in self.providers:
+            started = False
+            try:
+                for delta in provider.stream(prompt, deadline):
+                    started = True
+                    yield delta, provider.name
+                logging.info(f"Prediction streamed using {provider.name}.")
+                return
+            except LLMError as e:
+                if started:
+                    raise
+                logging.warning(f"{provider.name} failed: {e}")
+                errors.append(str(e))
+        raise LLMError(f"All providers failed: {'; '.join(errors) or 'deadline exceeded'}")
+
+    def stats(self):
+        return {provider.name: provider.stats() for provider in self.providers}
+
+
+# Default client: GPT-4 first, DeepSeek as the hedge/fallback
+def build_default_client(keys):
+    session = pooled_session()
+    return LLMClient([
+        LLMProvider('OpenAI GPT-4', OPENAI_API_URL, keys['OPENAI_API_KEY'], 'gpt-4', session=session),
+        LLMProvider('DeepSeek', DEEPSEEK_API_URL, keys['DEEPSEEK_API_KEY'], 'deepseek-chat', session=session),
+    ])
@@ -0,0 +1,184 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from team_index import ABBREVIATION_TEAMS, canonical_team_names
+
+# Win probability from a point-differential rating: P(home wins) = sigmoid((r_home - r_away + HOME_ADVANTAGE) / SCALE).
+# These are the defaults; `python local_model.py` fits both on backfilled seasons into MODEL_FILE.
+HOME_ADVANTAGE = 2.5  # Points
+SCALE = 7.0  # Points of rating difference per unit of log-odds
+PRIOR_GAMES = 5  # Shrinks ratings of teams with few games toward league average
+MODEL_FILE = 'local_model.json'
+
+
+# Per-game point differential for every team, shrunk toward zero early in the season.
+# Indexed by the canonical team names that TeamIndex.resolve() returns.
+def team_ratings(team_stats):
+    games = team_stats['GP'].to_numpy(dtype=np.float64)
+    plus_minus = team_stats['PLUS_MINUS'].to_numpy(dtype=np.float64)
+    return pd.Series(plus_minus / (games + PRIOR_GAMES), index=canonical_team_names(team_stats))
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+# Probability that the row team beats the column team, for every pair at once.
+# Rows are the home teams; pass home_advantage=0 for a neutral court.
+# Coefficients default to the fitted ones.
+def win_probability_matrix(team_stats, home_advantage=None, scale=None):
+    default_advantage, default_scale = coefficients()
+    home_advantage = default_advantage if home_advantage is None else home_advantage
+    scale = default_scale if scale is None else scale
+    ratings = team_ratings(team_stats)
+    values = ratings.to_numpy()
+    probabilities = _sigmoid((values[:, None] - values[None, :] + home_advantage) / scale)
+    np.fill_diagonal(probabilities, 0.5)
+    return pd.DataFrame(probabilities, index=ratings.index, columns=ratings.index)
+
+# Instant prediction for one matchup. home_team is team1 or team2 when known, else neutral court.
+def predict_matchup(team_stats, team1, team2, home_team=None, home_advantage=None, scale=None):
+    default_advantage, default_scale = coefficients()
+    home_advantage = default_advantage if home_advantage is None else home_advantage
+    scale = default_scale if scale is None else scale
+    ratings = team_ratings(team_stats)
+    advantage = {team1: home_advantage, team2: -home_advantage}.get(home_team, 0.0)
+    probability = float(_sigmoid((ratings[team1] - ratings[team2] + advantage) / scale))
+    winner = team1 if probability >= 0.5 else team2
+    return {'winner': winner, 'probability': max(probability, 1 - probability), 'team1_probability': probability}
+
+# Completed games (home, away, home_won) from TeamGameLog rows, using MATCHUP
+# ("DEN vs. OKC" is a DEN home game, "DEN @ OKC" an away game). Each game is kept once.
+def games_from_team_logs(logs):
+    rows = {}
+    for log in logs.to_dict('records'):
+        matchup = str(log['MATCHUP'])
+        if ' vs. ' in matchup:
+            home, away = matchup.split(' vs. ')
+            home_won = log['WL'] == 'W'
+        elif ' @ ' in matchup:
+            away, home = matchup.split(' @ ')
+            home_won = log['WL'] != 'W'
+        else:
+            continue
+        rows[str(log['Game_ID'])] = {
+            'GAME_DATE': log['GAME_DATE'], 'HOME': ABBREVIATION_TEAMS.get(home.strip()),
+            'AWAY': ABBREVIATION_TEAMS.get(away.strip()), 'HOME_WON': bool(home_won),
+        }
+    games = pd.DataFrame(list(rows.values()), columns=['GAME_DATE', 'HOME', 'AWAY', 'HOME_WON'])
+    return games.dropna(subset=['HOME', 'AWAY']).reset_index(drop=True)
+
+# Completed games with the home team's pre-game rating edge (RATING_DIFF), from team
+# game log rows (LeagueGameLog or TeamGameLog layout). A team's rating before a game
+# uses only its earlier games of that season, so fitting or scoring on these games
+# never sees the result being predicted.
+def games_with_pregame_ratings(logs):
+    logs = logs.rename(columns={'Game_ID': 'GAME_ID'})
+    logs = logs.assign(
+        GAME_ID=logs['GAME_ID'].astype(str),
+        GAME_DATE=pd.to_datetime(logs['GAME_DATE'], format='mixed'),
+        TEAM=logs['MATCHUP'].astype(str).str.split().str[0],
+        IS_HOME=logs['MATCHUP'].astype(str).str.contains(' vs. ', regex=False),
+        SEASON=logs['SEASON'] if 'SEASON' in logs.columns else '',
+    ).drop_duplicates(['GAME_ID', 'TEAM'])
+    if 'PLUS_MINUS' in logs.columns:
+        margin = logs['PLUS_MINUS'].astype(np.float64)
+    else:
+        # TeamGameLog rows have no PLUS_MINUS; use the opponent's row of the same game
+        totals = logs.groupby('GAME_ID')['PTS'].transform('sum')
+        margin = (2 * logs['PTS'] - totals).where(logs.groupby('GAME_ID')['PTS'].transform('size') == 2)
+    logs = logs.assign(MARGIN=margin).dropna(subset=['MARGIN']).sort_values(['GAME_DATE', 'GAME_ID'], kind='stable')
+
+    by_team = logs.groupby(['SEASON', 'TEAM'], sort=False)
+    prior_games = by_team.cumcount().to_numpy(dtype=np.float64)
+    prior_margin = by_team['MARGIN'].cumsum().to_numpy() - logs['MARGIN'].to_numpy()
+    logs = logs.assign(RATING=prior_margin / (prior_games + PRIOR_GAMES))
+
+    home = logs[logs['IS_HOME']].set_index('GAME_ID')
+    away = logs[~logs['IS_HOME']].set_index('GAME_ID')
+    games = home[['GAME_DATE', 'TEAM', 'RATING', 'MARGIN']].join(
+        away[['TEAM', 'RATING']], rsuffix='_AWAY', how='inner')
+    games = pd.DataFrame({
+        'GAME_DATE': games['GAME_DATE'].to_numpy(),
+        'HOME': games['TEAM'].map(ABBREVIATION_TEAMS).to_numpy(),
+        'AWAY': games['TEAM_AWAY'].map(ABBREVIATION_TEAMS).to_numpy(),
+        'HOME_WON': (games['MARGIN'] > 0).to_numpy(),
+        'RATING_DIFF': (games['RATING'] - games['RATING_AWAY']).to_numpy(),
+    })
+    return games.dropna(subset=['HOME', 'AWAY']).sort_values('GAME_DATE', kind='stable').reset_index(drop=True)
+
+# Fit HOME_ADVANTAGE and SCALE by logistic regression of HOME_WON on the pre-game
+# RATING_DIFF of `games` (see games_with_pregame_ratings). Plain Newton-Raphson on
+# two parameters; returns (home_advantage, scale), or the defaults if the fit fails.
+def fit(games, iterations=25):
+    if len(games) < 2:
+        return HOME_ADVANTAGE, SCALE
+    diff = games['RATING_DIFF'].to_numpy(dtype=np.float64)
+    outcome = games['HOME_WON'].to_numpy(dtype=np.float64)
+    features = np.column_stack([np.ones_like(diff), diff])
+    weights = np.array([HOME_ADVANTAGE / SCALE, 1 / SCALE])
+    for _ in range(iterations):
+        probability = _sigmoid(features @ weights)
+        gradient = features.T @ (outcome - probability)
+        hessian = -(features * (probability * (1 - probability))[:, None]).T @ features
+        hessian -= 1e-3 * np.eye(2)  # Ridge term keeps tiny samples well-posed
+        weights -= np.linalg.solve(hessian, gradient)
+    if weights[1] <= 0:
+        return HOME_ADVANTAGE, SCALE
+    return float(weights[0] / weights[1]), float(1 / weights[1])
+
+# Accuracy and Brier score on `games` with pre-game ratings. Fit the coefficients on
+# earlier games than these, or the figures are in-sample.
+def evaluate(games, home_advantage=None, scale=None):
+    if games.empty:
+        return {'games': 0, 'accuracy': None, 'brier': None}
+    default_advantage, default_scale = coefficients()
+    home_advantage = default_advantage if home_advantage is None else home_advantage
+    scale = default_scale if scale is None else scale
+    probability = _sigmoid((games['RATING_DIFF'].to_numpy(dtype=np.float64) + home_advantage) / scale)
+    outcome = games['HOME_WON'].to_numpy(dtype=np.float64)
+    return {
+        'games': len(games),
+        'accuracy': float(((probability >= 0.5) == (outcome == 1)).mean()),
+        'brier': float(((probability - outcome) ** 2).mean()),
+    }
+
+
+_coefficients = None
+
+# (home_advantage, scale) fitted by `python local_model.py`, or the defaults until then
+def coefficients(path=MODEL_FILE):
+    global _coefficients
+    if _coefficients is None:
+        try:
+            with open(path, 'r') as f:
+                fitted = json.load(f)
+            _coefficients = (fitted['home_advantage'], fitted['scale'])
+        except (OSError, ValueError, KeyError):
+            _coefficients = (HOME_ADVANTAGE, SCALE)
+    return _coefficients
+
+# Fit the coefficients on backfilled seasons (see backfill.py) and save them to MODEL_FILE
+def fit_history(seasons=None, directory=None, path=MODEL_FILE):
+    from backfill import HISTORY_DIR, iter_history
+    frames = list(iter_history('game_log', seasons=seasons, directory=directory or HISTORY_DIR))
+    if not frames:
+        raise ValueError("No backfilled game logs found; run backfill.py first.")
+    games = games_with_pregame_ratings(pd.concat(frames, ignore_index=True))
+    home_advantage, scale = fit(games)
+    fitted = {'home_advantage': home_advantage, 'scale': scale, 'games': len(games),
+              'seasons': sorted({frame['SEASON'].iloc[0] for frame in frames})}
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(fitted, f, indent=1)
+    os.replace(f"{path}.tmp", path)
+    global _coefficients
+    _coefficients = (home_advantage, scale)
+    return fitted
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fit the local model's home advantage and scale on backfilled seasons.")
+    parser.add_argument('--seasons', nargs='*', help="Seasons to fit on (default: all backfilled)")
+    parser.add_argument('--directory', help="History directory (default: history)")
+    args = parser.parse_args()
+    print(json.dumps(fit_history(args.seasons, args.directory), indent=2))
@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from metrics import metrics
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CONTEXT_DIR = 'matchups'
+CONTEXT_TTL = 3600  # Seconds a built context is reused
+CONTEXT_MAX_ENTRIES = 128
+
+
+# Prompt context for a matchup, shared by every user and worker looking at the
+# same teams on the same data snapshot. Entries live in an in-process LRU and in
+# matchups/<hash>.json (one file per matchup and snapshot version, written
+# atomically) so a predict request served by another worker finds the context
+# its search request built. Concurrent builds of the same key are collapsed.
+class MatchupContextCache:
+    def __init__(self, build, directory=CONTEXT_DIR, ttl=CONTEXT_TTL, max_entries=CONTEXT_MAX_ENTRIES):
+        self.build = build  # build(snapshot, team1, team2) -> context dict (JSON-serializable)
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def _key(self, snapshot, team1, team2):
+        team_index = snapshot.team_index
+        raw = f"{team_index.resolve(team1)}|{team_index.resolve(team2)}|{snapshot.version}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:24]
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _fresh(self, entry):
+        return entry is not None and time.time() - entry['created_at'] < self.ttl
+
+    def get_or_build(self, snapshot, team1, team2):
+        key = self._key(snapshot, team1, team2)
+        with self._lock:
+            entry = self._entries.get(key)
+            if self._fresh(entry):
+                self._entries.move_to_end(key)
+                metrics.count('matchup_context_total', result='memory_hit')
+                return entry['context']
+            building = self._building.get(key)
+            owner = building is None
+            if owner:
+                building = self._building[key] = threading.Event()
+
+        if not owner:
+            building.wait()
+            return self.get_or_build(snapshot, team1, team2)
+
+        try:
+            entry = self._read(key)
+            if self._fresh(entry):
+                metrics.count('matchup_context_total', result='disk_hit')
+            else:
+                metrics.count('matchup_context_total', result='miss')
+                with metrics.span('build_context'):
+                    entry = {'created_at': time.time(), 'context': self.build(snapshot, team1, team2)}
+                self._write(key, entry)
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return entry['context']
+        finally:
+            with self._lock:
+                del self._building[key]
+            building.set()
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key, entry):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, default=str)
+            os.replace(tmp_path, self._path(key))
+            self._prune()
+        except OSError as e:
+            logging.warning(f"Could not persist matchup context: {e}")
+
+    # Drop context files that have outlived the TTL
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith('.json') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,166 @@
+import os
+import re
+import time
+import pstats
+import logging
+import cProfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+PREFIX = 'nba_app'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  # Seconds
+PROFILE_DIR = 'profiles'
+# Set PROFILE_REQUESTS=true to allow ?profile=1 on any request
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', 'false').lower() == 'true'
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', f"{PREFIX}_{name}")
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+# In-process counters and timing histograms, rendered in the Prometheus text format.
+# span() times a block (and counts it as an error if it raises); count() bumps a
+# counter. Components that already keep their own stats() are exported as gauges
+# through register() instead of being counted twice.
+class Metrics:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for position, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram['buckets'][position] += 1
+                    break
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+    # Time a block as span_seconds{span=name, ...}; exceptions also count span_errors_total
+    @contextmanager
+    def span(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.count('span_errors_total', span=name, **labels)
+            raise
+        finally:
+            self.observe('span_seconds', time.perf_counter() - start, span=name, **labels)
+
+    # Export the numbers in collect() (a stats() dict) as <prefix>_<key> gauges.
+    # Nested dicts, e.g. per-provider stats, become a `name` label. Registering a
+    # prefix again (e.g. from a second app instance) replaces its collector.
+    def register(self, prefix, collect):
+        with self._lock:
+            self._collectors[prefix] = collect
+
+    def _collected(self):
+        gauges = defaultdict(list)
+        with self._lock:
+            collectors = list(self._collectors.items())
+        for prefix, collect in collectors:
+            try:
+                stats = collect() or {}
+            except Exception as e:
+                logging.warning(f"Metrics collector '{prefix}' failed: {e}")
+                continue
+            for key, value in stats.items():
+                if isinstance(value, dict):
+                    for stat, number in value.items():
+                        if isinstance(number, (int, float)):
+                            gauges[f"{prefix}_{stat}"].append(((('name', key),), float(number)))
+                elif isinstance(value, (int, float)):
+                    gauges[f"{prefix}_{key}"].append(((), float(value)))
+        return gauges
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: {**value, 'buckets': list(value['buckets'])} for key, value in self._histograms.items()}
+        lines = []
+
+        by_name = defaultdict(list)
+        for (name, labels), value in sorted(counters.items()):
+            by_name[name].append((labels, value))
+        for name, samples in by_name.items():
+            lines.append(f"# TYPE {_metric_name(name)} counter")
+            lines.extend(f"{_metric_name(name)}{_label_text(labels)} {value!r}" for labels, value in samples)
+
+        by_name = defaultdict(list)
+        for (name, labels), histogram in sorted(histograms.items()):
+            by_name[name].append((labels, histogram))
+        for name, samples in by_name.items():
+            metric = _metric_name(name)
+            lines.append(f"# TYPE {metric} histogram")
+            for labels, histogram in samples:
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram['buckets']):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_label_text(labels + (('le', f'{bound:g}'),))} {cumulative}")
+                lines.append(f"{metric}_bucket{_label_text(labels + (('le', '+Inf'),))} {histogram['count']}")
+                lines.append(f"{metric}_sum{_label_text(labels)} {histogram['sum']:.6f}")
+                lines.append(f"{metric}_count{_label_text(labels)} {histogram['count']}")
+
+        for name, samples in sorted(self._collected().items()):
+            lines.append(f"# TYPE {_metric_name(name)} gauge")
+            lines.extend(f"{_metric_name(name)}{_label_text(labels)} {value!r}" for labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+# Time every request of a Flask app as request_seconds{endpoint, method}. With
+# profile set, a request carrying ?profile=1 is also run under cProfile and its
+# stats are dumped to profiles/<time>-<endpoint>.prof (open with snakeviz, or
+# flameprof for a flame graph); the path comes back in the X-Profile header.
+def instrument_app(app, profile=PROFILE_REQUESTS, directory=PROFILE_DIR):
+    from flask import g, request
+
+    @app.before_request
+    def start_request():
+        g.request_start = time.perf_counter()
+        if profile and request.args.get('profile') == '1':
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def finish_request(response):
+        metrics.observe('request_seconds', time.perf_counter() - g.pop('request_start', time.perf_counter()),
+                        endpoint=request.endpoint or 'unknown', method=request.method)
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{request.endpoint}.prof")
+        profiler.dump_stats(path)
+        top = pstats.Stats(profiler).sort_stats('cumulative')
+        logging.info(f"Profiled {request.method} {request.path} in {path}; "
+                     f"{top.total_calls} calls, {top.total_tt:.3f}s total.")
+        response.headers['X-Profile'] = path
+        return response
@@ -0,0 +1,164 @@
+import os
+import time
+import json
+import random
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+import requests
+from nba_api.stats.library.http import NBAStatsHTTP
+from http_session import pooled_session
+from metrics import metrics
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+NBA_CACHE_DIR = 'nba_cache'
+MAX_CONCURRENCY = 4  # stats.nba.com requests in flight at once, across all threads
+MAX_RETRIES = 3
+BACKOFF = 1.0  # Base delay in seconds, doubled per retry and jittered
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Seconds a cached response is served before asking stats.nba.com again.
+# Responses about past seasons or past game dates never expire.
+ENDPOINT_TTLS = {
+    'scoreboardv2': 15 * 60,
+    'teamgamelog': 3600,
+    'leaguegamelog': 3600,
+    'leaguedashteamstats': 6 * 3600,
+    'leaguedashplayerstats': 6 * 3600,
+}
+DEFAULT_TTL = 3600
+
+# Set NBA_API_REPLAY=true to serve only recorded responses (no network), e.g. to run the pipeline offline
+REPLAY = os.environ.get('NBA_API_REPLAY', 'false').lower() == 'true'
+# Set NBA_API_SSL_VERIFY=false to skip certificate checks (some proxies re-sign stats.nba.com)
+SSL_VERIFY = os.environ.get('NBA_API_SSL_VERIFY', 'true').lower() != 'false'
+
+
+# The one transport for stats.nba.com traffic. nba_api endpoints call get() on
+# the session installed with install_transport(), so every endpoint shares a
+# keep-alive connection pool, a concurrency limit and retries with jittered
+# backoff. Successful responses are recorded in nba_cache/<endpoint>/<hash>.json,
+# keyed by endpoint plus parameters, and served again while their TTL lasts.
+class NBATransport:
+    def __init__(self, directory=NBA_CACHE_DIR, current_season=None, ttls=None, replay=REPLAY,
+                 max_concurrency=MAX_CONCURRENCY, max_retries=MAX_RETRIES, backoff=BACKOFF,
+                 verify=SSL_VERIFY, session=None):
+        self.directory = directory
+        self.current_season = current_season  # Callable returning e.g. '2024-25'
+        self.ttls = ENDPOINT_TTLS if ttls is None else ttls
+        self.replay = replay
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.verify = verify
+        self.session = session or pooled_session(max_concurrency)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.retries = 0
+
+    def _key(self, endpoint, params):
+        raw = f"{endpoint}?{urlencode(sorted(params, key=lambda kv: kv[0]))}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+    def _path(self, endpoint, key):
+        return os.path.join(self.directory, endpoint, f"{key}.json")
+
+    # Whether the request is about a finished season or a game date that is long past
+    def _is_historical(self, params):
+        params = dict(params)
+        season = params.get('Season')
+        if season and self.current_season is not None and str(season) < self.current_season():
+            return True
+        game_date = params.get('GameDate')
+        if game_date:
+            try:
+                return datetime.strptime(str(game_date), '%Y-%m-%d') < datetime.now() - timedelta(days=2)
+            except ValueError:
+                pass
+        return False
+
+    def _read(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, entry):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not record nba_api response: {e}")
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    # Same signature nba_api uses on a requests session; returns a requests.Response
+    def get(self, url, params=None, headers=None, proxies=None, timeout=None, **kwargs):
+        params = list(params.items()) if isinstance(params, dict) else list(params or [])
+        endpoint = url.rstrip('/').rsplit('/', 1)[-1].lower()
+        path = self._path(endpoint, self._key(endpoint, params))
+
+        entry = self._read(path)
+        if entry is not None and (self.replay or self._is_historical(params)
+                                  or time.time() - entry['fetched_at'] < self.ttls.get(endpoint, DEFAULT_TTL)):
+            self._count('hits')
+            return self._response(entry)
+        if self.replay:
+            raise requests.ConnectionError(f"No recorded response for {endpoint} {dict(params)}")
+
+        self._count('misses')
+        response = self._fetch(url, params, headers, proxies, timeout)
+        if response.status_code == 200:
+            self._write(path, {'url': response.url, 'params': params, 'fetched_at': time.time(), 'text': response.text})
+        return response
+
+    def _fetch(self, url, params, headers, proxies, timeout):
+        attempt = 0
+        while True:
+            try:
+                with self._slots, metrics.span('nba_api_request', endpoint=url.rstrip('/').rsplit('/', 1)[-1].lower()):
+                    response = self.session.get(url, params=params, headers=headers, proxies=proxies,
+                                                timeout=timeout, verify=self.verify)
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                error = requests.HTTPError(f"HTTP {response.status_code}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            attempt += 1
+            if attempt > self.max_retries:
+                metrics.count('upstream_errors_total', source='nba_api')
+                raise error
+            delay = self.backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+            logging.warning(f"stats.nba.com attempt {attempt} failed ({error}); retrying in {delay:.2f}s")
+            self._count('retries')
+            time.sleep(delay)
+
+    def _response(self, entry):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = entry['url']
+        response._content = entry['text'].encode('utf-8')
+        response.encoding = 'utf-8'
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {'cache_hits': self.hits, 'cache_misses': self.misses, 'retries': self.retries, 'replay': self.replay}
+
+
+# Route every nba_api stats endpoint through one shared transport
+def install_transport(**kwargs):
+    transport = NBATransport(**kwargs)
+    NBAStatsHTTP.set_session(transport)
+    return transport
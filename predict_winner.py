@@ -1,164 +1,113 @@
-import openai
-import pandas as pd
-import json
 import logging
-import requests
+from data_store import get_snapshot
+from prediction_cache import PredictionCache, prediction_key
+from llm_client import LLMError, build_default_client
+from local_model import predict_matchup
+from game_log_store import fetch_last_3_games_stats
+from matchup_context import MatchupContextCache
+from metrics import metrics
+from prompt_builder import prompt_builder
+from config import Lazy, get_config
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Load OpenAI API key
-with open('keys.json') as f:
-    keys = json.load(f)
-openai.api_key = keys['OPENAI_API_KEY']
-
-def deepseek_chat(prompt):
-
-    DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {keys['DEEPSEEK_API_KEY']}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "model": "deepseek-chat",
-        "messages": [{"role": "user", "content": prompt}]
-    }
-
+# Pooled chat client: GPT-4 first, hedged with DeepSeek if it is slow or fails.
+# Built from the configured API keys on first use.
+llm_client = Lazy(lambda: build_default_client(get_config()))
+
+# Predictions shared across requests and restarts, keyed on matchup and prompt;
+# the cache file is read on first use
+prediction_cache = Lazy(PredictionCache)
+
+# 'llm': chat model narrative, 'local': instant statistical pick, 'both': the pick followed by the narrative
+PREDICTION_MODES = ('llm', 'local', 'both')
+
+# Ask the model for a prediction. Raises LLMError if every provider fails.
+def generate_prediction(prompt):
+    prediction, _ = llm_client.chat(prompt)
+    return prediction
+
+
+# Build the model prompt for a matchup from a data snapshot and each team's recent games
+def build_prompt(snapshot, team1, team2, team1_last_3_games, team2_last_3_games):
+    prompt, _ = prompt_builder.build(snapshot, team1, team2, team1_last_3_games, team2_last_3_games)
+    return prompt
+
+# Everything the predict step needs for a matchup, built once per snapshot and
+# shared through matchup_contexts. Recent games come from the game log store.
+def build_matchup_context(snapshot, team1, team2):
+    logging.info(f"Building matchup context for {team1} vs {team2}...")
+    team1_last_3_games = fetch_last_3_games_stats(team1, snapshot.schedule_index)
+    team2_last_3_games = fetch_last_3_games_stats(team2, snapshot.schedule_index)
+    with metrics.span('build_prompt'):
+        prompt, report = prompt_builder.build(snapshot, team1, team2, team1_last_3_games, team2_last_3_games)
+    return {'prompt': prompt, 'prompt_tokens': report['tokens']}
+
+matchup_contexts = MatchupContextCache(build_matchup_context)
+
+# Prediction for a prompt, served from the cache when possible. Identical
+# concurrent requests share a single model call. Raises LLMError on failure.
+def cached_prediction(team1, team2, prompt):
+    return prediction_cache.get_or_compute(prediction_key(team1, team2, prompt),
+                                           lambda: generate_prediction(prompt))
+
+# One-line pick from the local statistical model; home_team is team1 or team2 if known
+def local_prediction(snapshot, team1, team2, home_team=None):
+    team_index = snapshot.team_index
+    team1, team2 = team_index.resolve(team1), team_index.resolve(team2)
+    home_team = team_index.resolve(home_team) if home_team else None
+    with metrics.span('local_model'):
+        pick = predict_matchup(snapshot.team_stats, team1, team2, home_team)
+    return f"Local model pick: {pick['winner']} (Confidence: {pick['probability']:.0%})"
+
+def predict_winner(team1, team2, mode='llm', home_team=None):
     try:
-        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=data)
-        result = response.json()
-        
-        return result.get('choices', [{}])[0].get('message', {}).get('content', "No prediction available.")
-    
-    except Exception as e:
+        if mode not in PREDICTION_MODES:
+            raise ValueError(f"Unknown prediction mode '{mode}'.")
 
-        return f"Error contacting Deepseek API: {e}"
+        # Use the shared in-memory data snapshot
+        snapshot = get_snapshot()
 
+        local = local_prediction(snapshot, team1, team2, home_team) if mode != 'llm' else None
+        if mode == 'local':
+            return local
 
-def predict_winner(team1, team2):
-    try:
-        # Load data from local files
-        logging.info("Loading team stats...")
-        team_stats = pd.read_csv('all_team_stats.csv')
-        logging.info("Loading player stats...")
-        player_stats = pd.read_csv('all_player_stats.csv')
-        logging.info("Loading team injuries...")
-        team_injuries = pd.read_csv('nba_injuries.csv')
-
-        # Load tweets if available
-        try:
-            logging.info("Loading tweets...")
-            tweets = pd.read_csv('tweets.csv')
-            # Filter relevant tweets (tweets that mention the teams or their players)
-            relevant_tweets = []
-            for tweet in tweets.to_dict('records'):
-                if any(keyword.lower() in tweet['Tweet'].lower() for keyword in [team1, team2] + player_stats[player_stats['TEAM_ABBREVIATION'].isin([team1.split()[-1].upper(), team2.split()[-1].upper()])]['PLAYER_NAME'].tolist()):
-                    relevant_tweets.append(tweet)
-            tweets_info = relevant_tweets if relevant_tweets else "No relevant tweets available."
-        except FileNotFoundError:
-            tweets_info = "No tweets available."
-            logging.warning("No tweets found. Proceeding without tweets.")
-        
-        # Load last 3 games stats
-        logging.info("Loading last 3 games stats...")
-        team1_last_3_games = pd.read_csv('last_3_games_stats_team1.csv')
-        team2_last_3_games = pd.read_csv('last_3_games_stats_team2.csv')
-        
-        # Filter data for the selected teams
-        logging.info(f"Filtering stats for {team1} and {team2}...")
-        
-        # Filter team stats
-        team1_stats = team_stats[team_stats['TEAM_NAME'] == team1].iloc[0]
-        team2_stats = team_stats[team_stats['TEAM_NAME'] == team2].iloc[0]
-        
-        # Get team abbreviations from the team_abbreviation_map
-        team_abbreviation_map = {
-            "Atlanta Hawks": "ATL", "Boston Celtics": "BOS", "Brooklyn Nets": "BKN", "Charlotte Hornets": "CHA",
-            "Chicago Bulls": "CHI", "Cleveland Cavaliers": "CLE", "Dallas Mavericks": "DAL", "Denver Nuggets": "DEN",
-            "Detroit Pistons": "DET", "Golden State Warriors": "GSW", "Houston Rockets": "HOU", "Indiana Pacers": "IND",
-            "Los Angeles Clippers": "LAC", "Los Angeles Lakers": "LAL", "Memphis Grizzlies": "MEM", "Miami Heat": "MIA",
-            "Milwaukee Bucks": "MIL", "Minnesota Timberwolves": "MIN", "New Orleans Pelicans": "NOP", "New York Knicks": "NYK",
-            "Oklahoma City Thunder": "OKC", "Orlando Magic": "ORL", "Philadelphia 76ers": "PHI", "Phoenix Suns": "PHX",
-            "Portland Trail Blazers": "POR", "Sacramento Kings": "SAC", "San Antonio Spurs": "SAS", "Toronto Raptors": "TOR",
-            "Utah Jazz": "UTA", "Washington Wizards": "WAS"
-        }
-        
-        team1_abbreviation = team_abbreviation_map.get(team1, "")
-        team2_abbreviation = team_abbreviation_map.get(team2, "")
-
-        
-        # Filter player stats using team abbreviations
-        team1_players = player_stats[player_stats['TEAM_ABBREVIATION'] == team1_abbreviation].sort_values(by='PTS', ascending=False).head(5).to_dict('records')
-        team2_players = player_stats[player_stats['TEAM_ABBREVIATION'] == team2_abbreviation].sort_values(by='PTS', ascending=False).head(5).to_dict('records')
-        
-
-        team1_missings = team_injuries[team_injuries['Team'] == team1]
-        team2_missings = team_injuries[team_injuries['Team'] == team2]
-        
-        # Generate GPT prompt
-        
-        prompt = f"""
-        ## 🏀 Predict the Winner: {team1} vs {team2}
-
-        ### **Team 1: {team1}**
-        - **Record:** {team1_stats['W']}W - {team1_stats['L']}L
-        - **Points Per Game:** {team1_stats['PTS']}
-        - **Field Goal Percentage:** {team1_stats['FG_PCT']}
-        - **Three-Point Percentage:** {team1_stats['FG3_PCT']}
-        - **Key Players:** {', '.join(player['PLAYER_NAME'] for player in team1_players)}
-        - **Last 3 Games:** {team1_last_3_games[['GAME_DATE', 'MATCHUP', 'WL', 'PTS']].to_dict('records')}
-        - **Injuries & Absences:** {', '.join(f"{player['Player']} ({player['Status']})" for player in team1_missings.to_dict('records'))}
-
-        ### **Team 2: {team2}**
-        - **Record:** {team2_stats['W']}W - {team2_stats['L']}L
-        - **Points Per Game:** {team2_stats['PTS']}
-        - **Field Goal Percentage:** {team2_stats['FG_PCT']}
-        - **Three-Point Percentage:** {team2_stats['FG3_PCT']}
-        - **Key Players:** {', '.join(player['PLAYER_NAME'] for player in team2_players)}
-        - **Last 3 Games:** {team2_last_3_games[['GAME_DATE', 'MATCHUP', 'WL', 'PTS']].to_dict('records')}
-        - **Injuries & Absences:** {', '.join(f"{player['Player']} ({player['Status']})" for player in team2_missings.to_dict('records'))}
-
-        ### **🗣️ Relevant Social Media Insights**
-        {tweets_info}
-
-        ## 🔍 **Analysis & Prediction**
-        1. **Compare team performance metrics** (scoring, efficiency, defense, key player impact).  
-        2. **Analyze recent form** (last 3 games and notable trends).  
-        3. **Account for injuries and absences** (impact on rotations and depth).  
-        4. **Factor in social media buzz** (any last-minute reports or significant trends).  
-        5. **Determine the most probable winner with a confidence score (%)**.
-
-        ---
-        ## 🏆 **Winner Prediction**  
-        **[Predicted_Winner]** (Confidence: [Confidence_Score]%)
-
-        ### **Reasoning:**  
-        [Detailed_Analysis]
-        """
+        # Context built by the search request, or rebuilt if it was evicted
+        prompt = matchup_contexts.get_or_build(snapshot, team1, team2)['prompt']
 
         try:
-            # Try GPT-4 first
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}]
-            )
-            prediction = response['choices'][0]['message']['content']
-            logging.info("Prediction generated using OpenAI GPT-4.")
-            return prediction
-
-        except Exception as e:
-            logging.warning(f"OpenAI GPT-4 failed: {e}")
-            logging.info("Falling back to DeepSeek...")
-            # Try DeepSeek if OpenAI fails
-            try:
-                prediction = deepseek_chat(prompt)
-                logging.info("Prediction generated using DeepSeek.")
-                return prediction
-            except Exception as de:
-                logging.error(f"DeepSeek API also failed: {de}")
-                return f"Error: Both OpenAI and DeepSeek failed. GPT error: {e}, DeepSeek error: {de}"
+            prediction = cached_prediction(team1, team2, prompt)
+        except LLMError as e:
+            logging.error(f"Prediction failed: {e}")
+            prediction = f"Error: {e}"
+        return f"{local}\n\n{prediction}" if local else prediction
 
     except Exception as e:
         logging.error(f"Error generating prediction: {e}")
         return f"Error generating prediction: {e}"
-    
\ No newline at end of file
+
+# predict_winner as a stream of (event, text) pairs: 'local' with the local pick,
+# then 'token' deltas of the model reply as they arrive, or 'error'. On a cache hit,
+# or when an identical prediction is already in flight, the whole reply comes as
+# one 'token'. The finished reply is stored in prediction_cache.
+def stream_prediction(team1, team2, mode='llm', home_team=None):
+    try:
+        if mode not in PREDICTION_MODES:
+            raise ValueError(f"Unknown prediction mode '{mode}'.")
+        snapshot = get_snapshot()
+        if mode != 'llm':
+            yield 'local', local_prediction(snapshot, team1, team2, home_team)
+        if mode == 'local':
+            return
+
+        prompt = matchup_contexts.get_or_build(snapshot, team1, team2)['prompt']
+        key = prediction_key(team1, team2, prompt)
+        with metrics.span('llm_stream'):
+            for delta in prediction_cache.stream_or_wait(key, lambda: (delta for delta, _ in llm_client.stream(prompt)),
+                                                         lambda: generate_prediction(prompt)):
+                yield 'token', delta
+
+    except Exception as e:
+        logging.error(f"Error streaming prediction: {e}")
+        yield 'error', f"Error generating prediction: {e}"
\ No newline at end of file
@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from llm_client import DEADLINE
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CACHE_DIR = 'predictions'
+CACHE_TTL = 6 * 3600  # Seconds a prediction stays valid
+CACHE_MAX_ENTRIES = 256  # Kept in memory; the files are bounded by the TTL
+PRUNE_INTERVAL = 600  # Seconds between sweeps for expired files
+WAIT_TIMEOUT = DEADLINE  # Longest a caller waits on an identical in-flight call before making its own
+
+
+# Cache key for a matchup: the teams in order plus a hash of the exact prompt,
+# so a new data snapshot (or any prompt change) gives a new key
+def prediction_key(team1, team2, prompt):
+    digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+    return f"{team1}|{team2}|{digest}"
+
+
+# Call in flight for a key; concurrent callers wait on it instead of calling upstream
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+# LRU cache of model predictions with a TTL. Every entry is also written to
+# predictions/<hash>.json (one file per key, written atomically), so entries
+# survive restarts and a prediction made by one worker process is served by the
+# others; a miss in memory reads the key's file. get_or_compute() and
+# stream_or_wait() collapse identical concurrent requests, streamed or not,
+# into a single model call. directory=None keeps the cache in memory only.
+class PredictionCache:
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, wait_timeout=WAIT_TIMEOUT):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.wait_timeouts = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._get_locked(key)
+        return value if value is not None else self._read(key)
+
+    def put(self, key, value):
+        entry = {'value': value, 'created_at': time.time()}
+        self._remember(key, entry)
+        self._write(key, entry)
+
+    # Return the cached value for key, or run compute() once for all concurrent callers.
+    # Failures are raised to every waiting caller and are not cached. A caller that
+    # has waited wait_timeout seconds for a hung call runs compute() itself.
+    def get_or_compute(self, key, compute):
+        value, in_flight, owner = self._claim(key)
+        if value is not None:
+            return value
+        if not owner:
+            return self._wait(key, in_flight, compute)
+
+        error = None
+        stored = False
+        try:
+            # Another worker may have made this prediction already
+            value = self._read(key)
+            stored = value is not None
+            if not stored:
+                value = compute()
+            return value
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._finish(key, in_flight, value, error, store=not stored)
+
+    # get_or_compute() for a streamed reply: yields the chunks of stream() as they
+    # arrive to the caller that makes the call, and the whole reply as one chunk on
+    # a hit or to callers that waited on it. If the streaming caller goes away before
+    # the reply is finished, its waiters run compute() themselves.
+    def stream_or_wait(self, key, stream, compute):
+        value, in_flight, owner = self._claim(key)
+        if value is None and not owner:
+            value = self._wait(key, in_flight, compute)
+        if value is not None:
+            yield value
+            return
+
+        value = self._read(key)
+        if value is not None:
+            self._finish(key, in_flight, value, None, store=False)
+            yield value
+            return
+
+        parts = []
+        error = None
+        try:
+            for chunk in stream():
+                parts.append(chunk)
+                yield chunk
+            value = ''.join(parts)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._finish(key, in_flight, value, error)
+
+    # (cached value, None, False) on a hit; otherwise (None, the call in flight for
+    # key, whether this caller registered it and so must make the call)
+    def _claim(self, key):
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                self.hits += 1
+                return value, None, False
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                self.misses += 1
+                in_flight = self._in_flight[key] = _InFlight()
+                return None, in_flight, True
+            self.coalesced += 1
+            return None, in_flight, False
+
+    def _wait(self, key, in_flight, compute):
+        if in_flight.done.wait(self.wait_timeout):
+            if in_flight.error is not None:
+                raise in_flight.error
+            if in_flight.value is not None:
+                return in_flight.value
+            logging.info(f"In-flight prediction for {key} was abandoned; calling the model again.")
+        else:
+            with self._lock:
+                self.wait_timeouts += 1
+            logging.warning(f"In-flight prediction for {key} took over {self.wait_timeout}s; calling the model again.")
+        value = compute()
+        self.put(key, value)
+        return value
+
+    # Publish the outcome of an owned call (value None and no error: abandoned) to its
+    # waiters; store=False when the value was read from another worker's file
+    def _finish(self, key, in_flight, value, error, store=True):
+        in_flight.value = value
+        in_flight.error = error
+        if value is not None and store:
+            self.put(key, value)
+        with self._lock:
+            del self._in_flight[key]
+        in_flight.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'disk_hits': self.disk_hits,
+                    'misses': self.misses, 'coalesced': self.coalesced, 'wait_timeouts': self.wait_timeouts,
+                    'in_flight': len(self._in_flight)}
+
+    def _get_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry['created_at'] >= self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry['value']
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:24]}.json")
+
+    # The key's value from its file (written by any worker) if still fresh, kept in memory too
+    def _read(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('key') != key or time.time() - entry['created_at'] >= self.ttl:
+            return None
+        self._remember(key, {'value': entry['value'], 'created_at': entry['created_at']})
+        with self._lock:
+            self.disk_hits += 1
+        return entry['value']
+
+    def _write(self, key, entry):
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, **entry}, f)
+            os.replace(tmp_path, self._path(key))
+            self._prune()
+        except OSError as e:
+            logging.warning(f"Could not persist prediction: {e}")
+
+    # Drop prediction files that have outlived the TTL, at most every PRUNE_INTERVAL seconds
+    def _prune(self):
+        now = time.time()
+        with self._lock:
+            if now - self._last_prune < PRUNE_INTERVAL:
+                return
+            self._last_prune = now
+        cutoff = now - self.ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith('.json') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
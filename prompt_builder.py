@@ -0,0 +1,197 @@
+import math
+import logging
+import threading
+import pandas as pd
+from metrics import metrics
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+TOKEN_BUDGET = 900  # Estimated prompt tokens; lowest-priority lines are dropped beyond this
+KEY_PLAYERS = 5
+MAX_TWEETS = 6
+TWEET_CHARS = 220
+MAX_CACHED_TEAMS = 256
+
+# Section priorities: lower numbers are kept longest when the prompt is over budget
+PRIORITY_REQUIRED = 0
+PRIORITY_TEAM = 1
+PRIORITY_FORM = 2
+PRIORITY_INJURIES = 3
+PRIORITY_PLAYERS = 4
+PRIORITY_TWEETS = 5
+
+INSTRUCTIONS = """## Analysis
+Weigh team efficiency, key players, recent form, injuries and any late news, then pick the most probable winner.
+
+## 🏆 Winner Prediction
+**[Predicted_Winner]** (Confidence: [Confidence_Score]%)
+
+### Reasoning:
+[Detailed_Analysis]"""
+
+
+# Rough token count (about four characters per token for English text and numbers)
+def estimate_tokens(text):
+    return math.ceil(len(text) / 4)
+
+def _per_game(stats, column):
+    games = stats.get('GP') or 0
+    return stats[column] / games if games else 0.0
+
+def _short_name(name):
+    first, _, last = str(name).partition(' ')
+    return f"{first[0]}. {last}" if last else first
+
+
+# One block of prompt lines. Over budget, lines are dropped from the end of the
+# lowest-priority sections, so a section's heading (its first line) goes last.
+class Section:
+    def __init__(self, name, priority, lines):
+        self.name = name
+        self.priority = priority
+        self.lines = list(lines)
+
+    def text(self):
+        return '\n'.join(self.lines)
+
+
+# Compact matchup prompts. Each team's stats, key players and injuries are
+# rendered once per data snapshot and reused by every matchup that team is in;
+# recent form and tweets are rendered per call. build() trims the result to the
+# token budget by priority and returns (prompt, report).
+class PromptBuilder:
+    def __init__(self, token_budget=TOKEN_BUDGET, key_players=KEY_PLAYERS, max_tweets=MAX_TWEETS):
+        self.token_budget = token_budget
+        self.key_players = key_players
+        self.max_tweets = max_tweets
+        self._team_sections = {}
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Stats, key players and injuries for one team, cached per snapshot version. None
+    # of them come from tweets, so a tweets-only reload (data_version unchanged) keeps them.
+    def team_sections(self, snapshot, team):
+        version = getattr(snapshot, 'data_version', getattr(snapshot, 'version', None))
+        with self._lock:
+            if version != self._version:
+                self._team_sections = {}
+                self._version = version
+            sections = self._team_sections.get(team)
+            if sections is not None:
+                self.hits += 1
+                return sections
+            self.misses += 1
+
+        team_index = snapshot.team_index
+        stats = team_index.team_stats(team)
+        team_line = Section(f'{team}:team', PRIORITY_TEAM, [
+            f"### {team}",
+            f"- Record {stats['W']}-{stats['L']} | {_per_game(stats, 'PTS'):.1f} PPG | "
+            f"FG {stats['FG_PCT']:.1%} | 3P {stats['FG3_PCT']:.1%} | +/- {_per_game(stats, 'PLUS_MINUS'):+.1f}",
+        ])
+        players = [
+            f"  - {_short_name(player['PLAYER_NAME'])}: {_per_game(player, 'PTS'):.1f} pts, "
+            f"{_per_game(player, 'REB'):.1f} reb, {_per_game(player, 'AST'):.1f} ast"
+            for player in team_index.top_players(team, self.key_players)
+        ]
+        injuries = [f"  - {injury['Player']} ({injury['Status']})" for injury in team_index.injuries(team)]
+        sections = (
+            team_line,
+            Section(f'{team}:players', PRIORITY_PLAYERS, ["- Key players:"] + players) if players else None,
+            Section(f'{team}:injuries', PRIORITY_INJURIES, ["- Injuries:"] + injuries) if injuries else None,
+        )
+        with self._lock:
+            # A newer snapshot may have reset the cache while these were rendered;
+            # sections of an older snapshot must not be served for the newer one
+            if self._version == version:
+                if len(self._team_sections) >= MAX_CACHED_TEAMS:
+                    self._team_sections.clear()
+                self._team_sections[team] = sections
+        return sections
+
+    def form_section(self, team, last_games):
+        lines = ["- Last games:"]
+        if last_games is None or last_games.empty or 'MATCHUP' not in last_games.columns:
+            lines.append("  - none available")
+        else:
+            # Plain lists: per-row pandas access costs more than rendering the lines
+            dates = [date.strftime('%m-%d') if isinstance(date, pd.Timestamp) else str(date)
+                     for date in last_games['GAME_DATE'].tolist()]
+            for date, matchup, result, points in zip(dates, last_games['MATCHUP'].tolist(),
+                                                     last_games['WL'].tolist(), last_games['PTS'].tolist()):
+                lines.append(f"  - {date} {matchup} {result} {points}")
+        return Section(f'{team}:form', PRIORITY_FORM, lines)
+
+    def tweet_section(self, snapshot, team1, team2):
+        if snapshot.tweets.empty or snapshot.tweet_index is None:
+            return None
+        with metrics.span('filter_tweets'):
+            tweets = snapshot.tweet_index.for_teams(team1, team2)[:self.max_tweets]
+        if not tweets:
+            return None
+        lines = ["## Latest news"]
+        for tweet in tweets:
+            text = ' '.join(str(tweet['Tweet']).split())
+            if len(text) > TWEET_CHARS:
+                text = text[:TWEET_CHARS - 1] + '…'
+            lines.append(f"- @{tweet['Username']}: {text}")
+        return Section('tweets', PRIORITY_TWEETS, lines)
+
+    def build(self, snapshot, team1, team2, team1_last_games, team2_last_games, token_budget=None):
+        budget = token_budget or self.token_budget
+        team1, team2 = snapshot.team_index.resolve(team1), snapshot.team_index.resolve(team2)
+        with metrics.span('build_prompt_sections'):
+            sections = [Section('header', PRIORITY_REQUIRED, [f"## Predict the winner: {team1} vs {team2}"])]
+            for team, last_games in ((team1, team1_last_games), (team2, team2_last_games)):
+                team_line, players, injuries = self.team_sections(snapshot, team)
+                # Copies, so trimming never touches the cached sections
+                sections.append(Section(team_line.name, team_line.priority, team_line.lines))
+                sections.append(self.form_section(team, last_games))
+                for section in (injuries, players):
+                    if section is not None:
+                        sections.append(Section(section.name, section.priority, section.lines))
+            tweets = self.tweet_section(snapshot, team1, team2)
+            if tweets is not None:
+                sections.append(tweets)
+            sections.append(Section('instructions', PRIORITY_REQUIRED, [INSTRUCTIONS]))
+
+        full_tokens = estimate_tokens('\n'.join(section.text() for section in sections))
+        dropped = self._fit(sections, budget)
+        prompt = '\n'.join(section.text() for section in sections if section.lines)
+        report = {
+            'tokens': estimate_tokens(prompt), 'untrimmed_tokens': full_tokens, 'budget': budget, 'dropped_lines': dropped,
+            'sections': {section.name: estimate_tokens(section.text()) for section in sections if section.lines},
+        }
+        metrics.count('prompt_tokens_total', report['tokens'])
+        logging.info(f"Prompt for {team1} vs {team2}: ~{report['tokens']} tokens"
+                     f"{f' ({dropped} lines dropped to fit {budget})' if dropped else ''}.")
+        return prompt, report
+
+    # Drop lines, lowest priority first, until the prompt fits the budget. Within a
+    # priority the longest section is trimmed first, so both teams lose lines evenly.
+    # Returns how many lines were dropped.
+    def _fit(self, sections, budget):
+        tokens = {id(section): estimate_tokens(section.text()) + 1 for section in sections}
+        total = sum(tokens.values())
+        dropped = 0
+        while total > budget:
+            candidates = [section for section in sections if section.priority != PRIORITY_REQUIRED and section.lines]
+            if not candidates:
+                break
+            section = max(candidates, key=lambda section: (section.priority, len(section.lines)))
+            section.lines.pop()
+            dropped += 1
+            new_tokens = estimate_tokens(section.text()) + 1 if section.lines else 0
+            total += new_tokens - tokens[id(section)]
+            tokens[id(section)] = new_tokens
+        return dropped
+
+    def stats(self):
+        with self._lock:
+            return {'cached_teams': len(self._team_sections), 'hits': self.hits, 'misses': self.misses}
+
+
+prompt_builder = PromptBuilder()
@@ -0,0 +1,33 @@
+import time
+import threading
+
+
+# Thread-safe token bucket: `rate` tokens per second, bursts of up to `capacity`.
+# acquire() blocks until a token is available. pause_until() empties the bucket
+# until a given time, for APIs that report when their rate-limit window resets.
+class TokenBucket:
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = max(self._paused_until - now, (tokens - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    # Block all callers until `resume_at` (a time.time() timestamp)
+    def pause_until(self, resume_at):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + max(resume_at - time.time(), 0))
+            self._tokens = 0
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import shutil
+from datetime import datetime
+import logging
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SNAPSHOT_DIR = 'snapshots'
+CURRENT_FILE = 'CURRENT'  # Inside SNAPSHOT_DIR; holds the id of the published snapshot
+KEEP_SNAPSHOTS = 3
+
+# Datasets the app reads: CSV file, the columns consumers use, and compact dtypes for them.
+# `snapshot` marks datasets written by the ingestion pipeline; the others only exist as CSV.
+DATASETS = {
+    'team_stats': {
+        'path': 'all_team_stats.csv',
+        'snapshot': True,
+        'dtypes': {
+            'TEAM_ID': 'int64', 'TEAM_NAME': 'string', 'GP': 'int16', 'W': 'int16', 'L': 'int16',
+            'W_PCT': 'float32', 'FG_PCT': 'float32', 'FG3_PCT': 'float32', 'PTS': 'int32',
+            'PLUS_MINUS': 'float32',
+        },
+    },
+    'player_stats': {
+        'path': 'all_player_stats.csv',
+        'snapshot': True,
+        'dtypes': {
+            'PLAYER_ID': 'int64', 'PLAYER_NAME': 'string', 'TEAM_ID': 'int64',
+            'TEAM_ABBREVIATION': 'category', 'GP': 'int16', 'MIN': 'float32',
+            'PTS': 'int32', 'REB': 'int32', 'AST': 'int32',
+        },
+    },
+    'injuries': {
+        'path': 'nba_injuries.csv',
+        'snapshot': True,
+        'dtypes': {
+            'Team': 'category', 'Player': 'string', 'Position': 'category',
+            'Estimated Return': 'string', 'Status': 'category',
+        },
+    },
+    'schedule': {
+        'path': 'schedule.csv',
+        'snapshot': True,
+        'dtypes': {'Game Date': 'string', 'Game ID': 'string', 'Home Team': 'string', 'Away Team': 'string'},
+    },
+    'tweets': {
+        'path': 'tweets.csv',
+        'snapshot': False,
+        'dtypes': {'Tweet ID': 'string', 'Username': 'string', 'Tweet': 'string', 'Created At': 'string'},
+    },
+}
+
+SNAPSHOT_DATASETS = [name for name, spec in DATASETS.items() if spec['snapshot']]
+
+
+# Write a DataFrame to CSV atomically so readers never see a half-written file
+def atomic_to_csv(df, path):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+# Project a frame onto the dataset's columns and cast them to the compact dtypes.
+# Missing columns are added empty so every version has the same layout.
+def apply_dtypes(name, df):
+    dtypes = DATASETS[name]['dtypes']
+    df = df.copy()
+    for column, dtype in dtypes.items():
+        if column not in df.columns:
+            df[column] = pd.Series(dtype=dtype, index=df.index)
+        elif str(df[column].dtype) != dtype:
+            df[column] = df[column].astype(dtype)
+    return df[list(dtypes)].reset_index(drop=True)
+
+def empty_dataset(name):
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in DATASETS[name]['dtypes'].items()})
+
+# Parse a dataset from its CSV file
+def read_csv_dataset(name, data_dir='.'):
+    spec = DATASETS[name]
+    path = os.path.join(data_dir, spec['path'])
+    if not os.path.exists(path):
+        logging.warning(f"{spec['path']} not found; using an empty {name} table.")
+        return empty_dataset(name)
+    text_columns = {column: dtype for column, dtype in spec['dtypes'].items() if dtype in ('string', 'category')}
+    df = pd.read_csv(path, usecols=lambda column: column in spec['dtypes'], dtype=text_columns)
+    return apply_dtypes(name, df)
+
+# Id of the published snapshot, or None if the pipeline hasn't written one yet
+def current_snapshot_id(data_dir='.'):
+    try:
+        with open(os.path.join(data_dir, SNAPSHOT_DIR, CURRENT_FILE), 'r') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def snapshot_path(snapshot_id, name, data_dir='.'):
+    return os.path.join(data_dir, SNAPSHOT_DIR, snapshot_id, f"{name}.feather")
+
+# Open a dataset from a Feather snapshot. The file is memory-mapped and
+# fixed-width columns without nulls are handed to pandas without copying.
+def read_snapshot_dataset(snapshot_id, name, data_dir='.'):
+    table = feather.read_table(snapshot_path(snapshot_id, name, data_dir), memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+# Read a dataset from the published binary snapshot, falling back to CSV
+def read_dataset(name, data_dir='.', snapshot_id=None):
+    if DATASETS[name]['snapshot']:
+        snapshot_id = snapshot_id or current_snapshot_id(data_dir)
+        if snapshot_id and os.path.exists(snapshot_path(snapshot_id, name, data_dir)):
+            return read_snapshot_dataset(snapshot_id, name, data_dir)
+    return read_csv_dataset(name, data_dir)
+
+# Write a new versioned snapshot and publish it. Datasets missing from `frames`
+# (e.g. a fetcher failed) are carried forward from the previous version.
+# CSV copies are written alongside when write_csv is set.
+def write_snapshot(frames, data_dir='.', write_csv=True, keep=KEEP_SNAPSHOTS):
+    previous_id = current_snapshot_id(data_dir)
+    # Ids sort chronologically; a fresh directory is used every time because
+    # files of published snapshots may be memory-mapped by other workers
+    snapshot_id = datetime.now().strftime('%Y%m%dT%H%M%S%f') + f"-{os.getpid()}"
+    directory = os.path.join(data_dir, SNAPSHOT_DIR, snapshot_id)
+    os.makedirs(directory)
+
+    manifest = {'id': snapshot_id, 'created_at': time.time(), 'datasets': {}}
+    for name in SNAPSHOT_DATASETS:
+        if frames.get(name) is not None:
+            df = apply_dtypes(name, frames[name])
+            source = 'fetched'
+            if write_csv:
+                atomic_to_csv(frames[name], os.path.join(data_dir, DATASETS[name]['path']))
+        else:
+            df = read_dataset(name, data_dir, snapshot_id=previous_id)
+            source = previous_id or 'csv'
+        feather.write_feather(pa.Table.from_pandas(df, preserve_index=False),
+                              snapshot_path(snapshot_id, name, data_dir), compression='uncompressed')
+        manifest['datasets'][name] = {'rows': len(df), 'source': source}
+
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Publish by swapping the CURRENT pointer atomically
+    current_path = os.path.join(data_dir, SNAPSHOT_DIR, CURRENT_FILE)
+    with open(f"{current_path}.tmp", 'w') as f:
+        f.write(snapshot_id)
+    os.replace(f"{current_path}.tmp", current_path)
+    logging.info(f"Published data snapshot {snapshot_id}.")
+
+    _prune_snapshots(data_dir, keep, snapshot_id)
+    return snapshot_id
+
+# Remove all but the newest `keep` snapshot directories. Workers that still have
+# an older snapshot memory-mapped keep their view until they reload.
+def _prune_snapshots(data_dir, keep, current_id):
+    root = os.path.join(data_dir, SNAPSHOT_DIR)
+    snapshot_ids = sorted(entry for entry in os.listdir(root)
+                          if entry != current_id and os.path.isdir(os.path.join(root, entry)))
+    for snapshot_id in snapshot_ids[:len(snapshot_ids) - (keep - 1)]:
+        shutil.rmtree(os.path.join(root, snapshot_id), ignore_errors=True)
@@ -0,0 +1,100 @@
+# Team name to abbreviation, shared by the web app and the prediction code
+TEAM_ABBREVIATIONS = {
+    "Atlanta Hawks": "ATL", "Boston Celtics": "BOS", "Brooklyn Nets": "BKN", "Charlotte Hornets": "CHA",
+    "Chicago Bulls": "CHI", "Cleveland Cavaliers": "CLE", "Dallas Mavericks": "DAL", "Denver Nuggets": "DEN",
+    "Detroit Pistons": "DET", "Golden State Warriors": "GSW", "Houston Rockets": "HOU", "Indiana Pacers": "IND",
+    "Los Angeles Clippers": "LAC", "Los Angeles Lakers": "LAL", "Memphis Grizzlies": "MEM", "Miami Heat": "MIA",
+    "Milwaukee Bucks": "MIL", "Minnesota Timberwolves": "MIN", "New Orleans Pelicans": "NOP", "New York Knicks": "NYK",
+    "Oklahoma City Thunder": "OKC", "Orlando Magic": "ORL", "Philadelphia 76ers": "PHI", "Phoenix Suns": "PHX",
+    "Portland Trail Blazers": "POR", "Sacramento Kings": "SAC", "San Antonio Spurs": "SAS", "Toronto Raptors": "TOR",
+    "Utah Jazz": "UTA", "Washington Wizards": "WAS"
+}
+ABBREVIATION_TEAMS = {abbreviation: name for name, abbreviation in TEAM_ABBREVIATIONS.items()}
+NBA_TEAMS = sorted(TEAM_ABBREVIATIONS)
+
+# stats.nba.com team IDs (the same as nba_api's bundled static data), listed here
+# so that importing the team tables does not import nba_api
+ABBREVIATION_IDS = {
+    "ATL": 1610612737, "BOS": 1610612738, "BKN": 1610612751, "CHA": 1610612766, "CHI": 1610612741, "CLE": 1610612739,
+    "DAL": 1610612742, "DEN": 1610612743, "DET": 1610612765, "GSW": 1610612744, "HOU": 1610612745, "IND": 1610612754,
+    "LAC": 1610612746, "LAL": 1610612747, "MEM": 1610612763, "MIA": 1610612748, "MIL": 1610612749, "MIN": 1610612750,
+    "NOP": 1610612740, "NYK": 1610612752, "OKC": 1610612760, "ORL": 1610612753, "PHI": 1610612755, "PHX": 1610612756,
+    "POR": 1610612757, "SAC": 1610612758, "SAS": 1610612759, "TOR": 1610612761, "UTA": 1610612762, "WAS": 1610612764
+}
+# Team name (lower-cased) to NBA team ID, and NBA team ID to team name
+TEAM_IDS = {name.lower(): ABBREVIATION_IDS[abbreviation] for name, abbreviation in TEAM_ABBREVIATIONS.items()}
+ID_TEAMS = {team_id: ABBREVIATION_TEAMS[abbreviation] for abbreviation, team_id in ABBREVIATION_IDS.items()}
+
+TOP_PLAYERS = 15  # Roster depth kept per team; callers slice what they need
+
+
+# Look up a team ID by full name without scanning the team list
+def get_team_id(team_name):
+    team_id = TEAM_IDS.get(team_name.strip().lower())
+    if team_id is None:
+        raise ValueError(f"Team '{team_name}' not found.")
+    return team_id
+
+# Canonical name (as in TEAM_ABBREVIATIONS) for each row of a stats.nba.com team table.
+# Rows are matched on TEAM_ID because TEAM_NAME can differ, e.g. "LA Clippers".
+def canonical_team_names(team_stats):
+    return [ID_TEAMS.get(int(team_id), team_name)
+            for team_id, team_name in zip(team_stats['TEAM_ID'], team_stats['TEAM_NAME'])]
+
+
+# Per-team lookups built once per data snapshot. Teams can be referred to by
+# full name, abbreviation, team ID or stats.nba.com/ESPN name (any case); every
+# form resolves to the one canonical name from TEAM_ABBREVIATIONS, which keys
+# the stats, rosters and injuries. Results are plain dicts/lists.
+class TeamIndex:
+    def __init__(self, team_stats, player_stats, injuries, top_players=TOP_PLAYERS):
+        self._names = {}
+        for name, abbreviation in TEAM_ABBREVIATIONS.items():
+            self._names[name.lower()] = name
+            self._names[abbreviation.lower()] = name
+            self._names[str(ABBREVIATION_IDS[abbreviation])] = name
+        names = canonical_team_names(team_stats)
+        for name, team_name, team_id in zip(names, team_stats['TEAM_NAME'], team_stats['TEAM_ID']):
+            self._names[str(team_id)] = name
+            self._names[team_name.lower()] = name
+
+        self._stats = dict(zip(names, team_stats.to_dict('records')))
+
+        # Sort the player table once; every team's roster is then a slice
+        by_points = player_stats.sort_values('PTS', ascending=False, kind='stable')
+        self._rosters = {}
+        self._player_names = {}
+        for abbreviation, players in by_points.groupby('TEAM_ABBREVIATION', observed=True, sort=False):
+            name = ABBREVIATION_TEAMS.get(abbreviation)
+            if name is None:
+                continue
+            self._rosters[name] = players.head(top_players).to_dict('records')
+            self._player_names[name] = players['PLAYER_NAME'].tolist()
+
+        self._injuries = {}
+        for injury in injuries.to_dict('records'):
+            self._injuries.setdefault(self._names.get(str(injury['Team']).lower(), injury['Team']), []).append(injury)
+
+    # Canonical full team name for a name, abbreviation or ID
+    def resolve(self, team):
+        name = self._names.get(str(team).strip().lower())
+        if name is None:
+            raise ValueError(f"Team '{team}' not found.")
+        return name
+
+    def team_stats(self, team):
+        name = self.resolve(team)
+        if name not in self._stats:
+            raise ValueError(f"No stats available for '{name}'.")
+        return self._stats[name]
+
+    # Top players by points, best first
+    def top_players(self, team, n=5):
+        return self._rosters.get(self.resolve(team), [])[:n]
+
+    # Every player on the team's roster, ordered by points
+    def player_names(self, team):
+        return self._player_names.get(self.resolve(team), [])
+
+    def injuries(self, team):
+        return self._injuries.get(self.resolve(team), [])
@@ -0,0 +1,152 @@
+import json
+import time
+from datetime import datetime, timezone
+import pandas as pd
+import requests
+import tweepy
+from fetch_tweets import TweetIngestor
+
+
+def make_response(body, status_code=200, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = 'Too Many Requests' if status_code == 429 else 'OK'
+    response._content = json.dumps(body).encode('utf-8')
+    response.headers.update(headers or {})
+    return response
+
+
+# Stand-in for tweepy.Client(return_type=requests.Response). Each user's timeline is
+# a list of tweet IDs; get_users_tweets honours since_id. `replies` queues canned
+# responses (or exceptions) for get_users_tweets ahead of the timeline.
+class FakeClient:
+    def __init__(self, timelines):
+        self.timelines = timelines
+        self.user_lookups = []
+        self.tweet_requests = []
+        self.replies = []
+
+    def get_user(self, username):
+        self.user_lookups.append(username)
+        return make_response({'data': {'id': f'id-{username}', 'username': username}})
+
+    def get_users_tweets(self, id, **params):
+        self.tweet_requests.append({'id': id, **params})
+        if self.replies:
+            reply = self.replies.pop(0)
+            if isinstance(reply, Exception):
+                raise reply
+            return reply
+        username = id.removeprefix('id-')
+        since_id = int(params.get('since_id', 0))
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+        tweets = [{'id': str(tweet_id), 'text': f'{username} tweet {tweet_id}', 'created_at': created_at}
+                  for tweet_id in sorted(self.timelines[username], reverse=True) if tweet_id > since_id]
+        meta = {'result_count': len(tweets)}
+        if tweets:
+            meta['newest_id'] = tweets[0]['id']
+        return make_response({'data': tweets, 'meta': meta} if tweets else {'meta': meta},
+                             headers={'x-rate-limit-remaining': '100', 'x-rate-limit-reset': str(int(time.time()) + 900)})
+
+
+def make_ingestor(tmp_path, client, usernames=('wojespn', 'ShamsCharania'), min_interval=0):
+    usernames_file = tmp_path / 'usernames.txt'
+    usernames_file.write_text('\n'.join(usernames) + '\n')
+    return TweetIngestor(client, usernames_file=str(usernames_file), tweets_file=str(tmp_path / 'tweets.csv'),
+                         state_file=str(tmp_path / 'tweet_state.json'), lock_file=str(tmp_path / 'tweets.lock'),
+                         max_workers=2, min_interval=min_interval)
+
+
+# Records pause_until() calls instead of sleeping
+def spy_pauses(bucket):
+    pauses = []
+    bucket.pause_until = pauses.append
+    return pauses
+
+
+def test_user_ids_are_looked_up_once_and_persisted(tmp_path):
+    client = FakeClient({'wojespn': [1], 'ShamsCharania': [2]})
+    ingestor = make_ingestor(tmp_path, client)
+    ingestor.ingest()
+    ingestor.ingest()
+    assert sorted(client.user_lookups) == ['ShamsCharania', 'wojespn']
+
+    # A new process reads the cached IDs from the state file
+    make_ingestor(tmp_path, client).ingest()
+    assert len(client.user_lookups) == 2
+
+
+def test_since_id_advances_across_runs(tmp_path):
+    client = FakeClient({'wojespn': [101, 102]})
+    ingestor = make_ingestor(tmp_path, client, usernames=['wojespn'])
+
+    assert ingestor.ingest()['new_tweets'] == 2
+    first = client.tweet_requests[-1]
+    assert 'since_id' not in first and 'start_time' in first
+
+    client.timelines['wojespn'].append(103)
+    assert ingestor.ingest()['new_tweets'] == 1
+    assert client.tweet_requests[-1]['since_id'] == '102'
+
+    assert ingestor.ingest()['new_tweets'] == 0
+    assert client.tweet_requests[-1]['since_id'] == '103'
+    tweets = pd.read_csv(tmp_path / 'tweets.csv', dtype=str)
+    assert sorted(tweets['Tweet ID']) == ['101', '102', '103']
+
+
+def test_exhausted_rate_limit_headers_pause_the_bucket(tmp_path):
+    client = FakeClient({'wojespn': []})
+    ingestor = make_ingestor(tmp_path, client, usernames=['wojespn'])
+    pauses = spy_pauses(ingestor.user_tweets_bucket)
+    reset = int(time.time()) + 600
+    client.replies.append(make_response({'meta': {'result_count': 0}},
+                                        headers={'x-rate-limit-remaining': '0', 'x-rate-limit-reset': str(reset)}))
+
+    ingestor.ingest()
+    assert pauses == [reset]
+
+    # Remaining budget leaves the bucket alone
+    ingestor.ingest()
+    assert pauses == [reset]
+
+
+def test_too_many_requests_is_retried_once(tmp_path):
+    client = FakeClient({'wojespn': [201]})
+    ingestor = make_ingestor(tmp_path, client, usernames=['wojespn'])
+    pauses = spy_pauses(ingestor.user_tweets_bucket)
+    reset = int(time.time()) + 60
+    too_many = make_response({'title': 'Too Many Requests'}, status_code=429, headers={'x-rate-limit-reset': str(reset)})
+
+    client.replies.append(tweepy.TooManyRequests(too_many))
+    summary = ingestor.ingest()
+    assert summary == {'users': 1, 'new_tweets': 1, 'failed': []}
+    assert len(client.tweet_requests) == 2
+    assert pauses == [reset]
+
+    # A second 429 in a row gives up on the user for this run
+    client.replies.extend([tweepy.TooManyRequests(too_many), tweepy.TooManyRequests(too_many)])
+    assert ingestor.ingest()['failed'] == ['wojespn']
+    assert len(client.tweet_requests) == 4
+
+
+# Two ingestors on the same files stand in for two web worker processes
+def test_workers_share_one_ingestion(tmp_path):
+    client = FakeClient({'wojespn': [301]})
+    first = make_ingestor(tmp_path, client, usernames=['wojespn'], min_interval=300)
+    second = make_ingestor(tmp_path, client, usernames=['wojespn'], min_interval=300)
+
+    (tmp_path / 'tweets.lock').write_text('12345')
+    assert first.ingest() is None
+    assert client.tweet_requests == []
+    (tmp_path / 'tweets.lock').unlink()
+
+    assert first.ingest(first.min_interval)['new_tweets'] == 1
+    # The other worker sees the recent run in the state file and skips its own
+    assert second.ingest(second.min_interval) is None
+    assert len(client.tweet_requests) == 1
+
+    # When it does run, it continues from the since_id the first worker saved
+    client.timelines['wojespn'].append(302)
+    assert second.ingest()['new_tweets'] == 1
+    assert client.tweet_requests[-1]['since_id'] == '301'
+    assert not (tmp_path / 'tweets.lock').exists()
@@ -0,0 +1,40 @@
+import pandas as pd
+from game_log_store import GameLogStore
+
+
+# Stand-in for fetch_team_game_log: returns the queued games and records each call
+class FakeFetch:
+    def __init__(self):
+        self.calls = []
+        self.games = []
+
+    def __call__(self, team_id, season, date_from=None):
+        self.calls.append(date_from)
+        games, self.games = self.games, []
+        return pd.DataFrame(games, columns=['Game_ID', 'GAME_DATE', 'WL', 'PTS']).astype({'GAME_DATE': 'datetime64[ns]'})
+
+
+def game(game_id, day, wl='W'):
+    return {'Game_ID': game_id, 'GAME_DATE': pd.Timestamp(day), 'WL': wl, 'PTS': 110}
+
+
+# Two stores on the same directory stand in for two worker processes
+def test_workers_see_each_others_fetches(tmp_path):
+    fetch = FakeFetch()
+    first = GameLogStore(directory=str(tmp_path), fetch=fetch)
+    second = GameLogStore(directory=str(tmp_path), fetch=fetch)
+
+    fetch.games = [game('1', '2025-01-01'), game('2', '2025-01-03', 'L')]
+    assert list(first.update('Denver Nuggets')['Game_ID']) == ['2', '1']
+    # Checked moments ago by the other worker, so no second fetch
+    assert list(second.update('Denver Nuggets')['Game_ID']) == ['2', '1']
+    assert len(fetch.calls) == 1
+
+    # A later fetch by the second worker reaches the first one through the files
+    second.min_check_interval = 0
+    fetch.games = [game('3', '2025-01-05')]
+    second.update('Denver Nuggets')
+    assert fetch.calls[-1] == pd.Timestamp('2025-01-03')
+    assert list(first.update('Denver Nuggets')['Game_ID']) == ['3', '2', '1']
+    assert len(fetch.calls) == 2
+    assert not list(tmp_path.rglob('*.tmp'))
@@ -0,0 +1,145 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from llm_client import LLMClient, LLMError, LLMProvider
+from http_session import pooled_session
+
+
+# Local OpenAI-compatible chat server. Each path plays back a script of replies,
+# one per request (the last one repeats): ('ok', text, delay), ('status', code, delay)
+# or ('stream', chunks, delay before each chunk) for streamed requests.
+class StubChatServer:
+    def __init__(self):
+        self.scripts = {}
+        self.requests = {}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                count = stub.requests.get(self.path, 0)
+                stub.requests[self.path] = count + 1
+                script = stub.scripts[self.path]
+                kind, value, delay = script[min(count, len(script) - 1)]
+                if kind != 'stream':
+                    time.sleep(delay)
+                if kind == 'status':
+                    self.send_response(value)
+                    self.end_headers()
+                    return
+                if kind == 'stream':
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/event-stream')
+                    self.end_headers()
+                    try:
+                        for chunk in value:
+                            time.sleep(delay)
+                            self.wfile.write(f"data: {json.dumps({'choices': [{'delta': {'content': chunk}}]})}\n\n".encode())
+                            self.wfile.flush()
+                        self.wfile.write(b"data: [DONE]\n\n")
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass  # The client gave up on the stream
+                    return
+                reply = json.dumps({'choices': [{'message': {'content': f"{value}: {body['messages'][0]['content']}"}}]})
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(reply.encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def provider(self, name, script, **kwargs):
+        self.scripts[f'/{name}'] = script
+        session = pooled_session()
+        session.trust_env = False
+        return LLMProvider(name, f"http://127.0.0.1:{self.server.server_port}/{name}", 'test-key', 'stub',
+                           session=session, **kwargs)
+
+
+@pytest.fixture
+def server():
+    stub = StubChatServer()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+def test_slow_primary_is_hedged(server):
+    primary = server.provider('primary', [('ok', 'primary', 2.0)])
+    fallback = server.provider('fallback', [('ok', 'fallback', 0)])
+    client = LLMClient([primary, fallback], hedge_after=0.1, deadline=5)
+
+    start = time.monotonic()
+    text, name = client.chat('Nuggets vs Celtics')
+    assert (text, name) == ('fallback: Nuggets vs Celtics', 'fallback')
+    assert time.monotonic() - start < 1.5
+
+
+def test_failing_primary_falls_back(server):
+    primary = server.provider('primary', [('status', 400, 0)])
+    fallback = server.provider('fallback', [('ok', 'fallback', 0)])
+    client = LLMClient([primary, fallback], hedge_after=5, deadline=5)
+
+    assert client.chat('prompt') == ('fallback: prompt', 'fallback')
+    # Client errors are not retried
+    assert server.requests['/primary'] == 1
+    assert client.stats()['primary']['errors'] == 1
+
+
+def test_server_errors_are_retried_with_backoff(server):
+    primary = server.provider('primary', [('status', 503, 0), ('status', 502, 0), ('ok', 'primary', 0)],
+                              max_retries=2, backoff=0.01)
+    client = LLMClient([primary], deadline=5)
+
+    assert client.chat('prompt') == ('primary: prompt', 'primary')
+    assert server.requests['/primary'] == 3
+
+
+def test_retries_give_up_at_the_deadline(server):
+    primary = server.provider('primary', [('status', 503, 0)], max_retries=100, backoff=0.05)
+    client = LLMClient([primary], deadline=0.5)
+
+    start = time.monotonic()
+    with pytest.raises(LLMError):
+        client.chat('prompt')
+    assert time.monotonic() - start < 1.5
+    assert 1 < server.requests['/primary'] < 100
+
+
+def test_request_timeout_is_cut_to_the_deadline(server):
+    primary = server.provider('primary', [('ok', 'primary', 2.0)], timeout=60, max_retries=0)
+    client = LLMClient([primary], deadline=0.3)
+
+    start = time.monotonic()
+    with pytest.raises(LLMError):
+        client.chat('prompt')
+    assert time.monotonic() - start < 1.5
+
+
+def test_stream_yields_chunks_in_order(server):
+    primary = server.provider('primary', [('stream', ['Denver ', 'Nuggets'], 0)])
+    client = LLMClient([primary], deadline=5)
+
+    assert list(client.stream('prompt')) == [('Denver ', 'primary'), ('Nuggets', 'primary')]
+
+
+def test_trickling_stream_stops_at_the_deadline(server):
+    # Every chunk arrives well within the read timeout, but the whole reply would take 4s.
+    # Chunks are longer than the 512 bytes iter_lines() reads at a time, so each one is seen as it arrives.
+    primary = server.provider('primary', [('stream', ['x' * 600] * 20, 0.2)], timeout=60, max_retries=0)
+    client = LLMClient([primary], deadline=0.7)
+
+    start = time.monotonic()
+    chunks = []
+    with pytest.raises(LLMError):
+        for delta, _ in client.stream('prompt'):
+            chunks.append(delta)
+    assert time.monotonic() - start < 1.5
+    assert 0 < len(chunks) < 20
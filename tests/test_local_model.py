@@ -0,0 +1,13 @@
+import pandas as pd
+import local_model
+
+
+def test_ratings_use_the_canonical_team_names():
+    team_stats = pd.DataFrame({'TEAM_ID': [1610612746, 1610612743], 'TEAM_NAME': ['LA Clippers', 'Denver Nuggets'],
+                               'GP': [82, 82], 'PLUS_MINUS': [300, 500]})
+    assert list(local_model.team_ratings(team_stats).index) == ['Los Angeles Clippers', 'Denver Nuggets']
+
+    pick = local_model.predict_matchup(team_stats, 'Los Angeles Clippers', 'Denver Nuggets',
+                                       home_team='Los Angeles Clippers', home_advantage=0, scale=7.0)
+    assert pick['winner'] == 'Denver Nuggets'
+    assert local_model.win_probability_matrix(team_stats, 0, 7.0).loc['Los Angeles Clippers', 'Denver Nuggets'] < 0.5
@@ -0,0 +1,149 @@
+import time
+import threading
+import pytest
+import prediction_cache
+from prediction_cache import PredictionCache, prediction_key
+
+
+# Stand-in for the chat model: counts calls and can hold them until released
+class StubModel:
+    def __init__(self, release=None):
+        self.calls = 0
+        self.release = release
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt='prompt'):
+        with self._lock:
+            self.calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        return f"Winner for {prompt}"
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prediction_cache.time, 'time', lambda: now[0])
+    cache = PredictionCache(directory=None, ttl=60)
+    cache.put('a', 'pick')
+    now[0] += 59
+    assert cache.get('a') == 'pick'
+    now[0] += 1
+    assert cache.get('a') is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(directory=None, max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+
+def test_entries_are_persisted_and_reloaded(tmp_path):
+    key = prediction_key('Denver Nuggets', 'Boston Celtics', 'prompt')
+    PredictionCache(directory=str(tmp_path)).put(key, 'Denver Nuggets')
+    assert PredictionCache(directory=str(tmp_path)).get(key) == 'Denver Nuggets'
+    # Expired entries are ignored
+    assert PredictionCache(directory=str(tmp_path), ttl=0).get(key) is None
+
+
+# Two caches on the same directory stand in for two worker processes
+def test_workers_share_entries_without_overwriting_each_other(tmp_path):
+    first = PredictionCache(directory=str(tmp_path))
+    second = PredictionCache(directory=str(tmp_path))
+    first.put('a', 'Denver Nuggets')
+    second.put('b', 'Boston Celtics')
+
+    model = StubModel()
+    assert second.get_or_compute('a', model) == 'Denver Nuggets'
+    assert list(first.stream_or_wait('b', lambda: iter(['x']), model)) == ['Boston Celtics']
+    assert model.calls == 0
+    assert second.stats()['disk_hits'] == 1
+
+    restarted = PredictionCache(directory=str(tmp_path))
+    assert restarted.get('a') == 'Denver Nuggets' and restarted.get('b') == 'Boston Celtics'
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_concurrent_identical_calls_share_one_model_call():
+    release = threading.Event()
+    model = StubModel(release)
+    cache = PredictionCache(directory=None)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('key', model)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()['coalesced'] < 7:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert model.calls == 1
+    assert results == ['Winner for prompt'] * 8
+    assert cache.get_or_compute('key', model) == 'Winner for prompt'
+    assert model.calls == 1
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    cache = PredictionCache(directory=None)
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('key', fail)
+    assert cache.get('key') is None
+    assert cache.get_or_compute('key', StubModel()) == 'Winner for prompt'
+
+
+def test_waiter_calls_the_model_itself_when_the_owner_hangs():
+    hung = threading.Event()
+    cache = PredictionCache(directory=None, wait_timeout=0.1)
+    owner = threading.Thread(target=cache.get_or_compute, args=('key', StubModel(hung)), daemon=True)
+    owner.start()
+    while cache.stats()['in_flight'] == 0:
+        time.sleep(0.01)
+
+    assert cache.get_or_compute('key', StubModel()) == 'Winner for prompt'
+    assert cache.stats()['wait_timeouts'] == 1
+    hung.set()
+    owner.join(5)
+
+
+def test_streamed_call_is_shared_with_waiting_callers():
+    release = threading.Event()
+    cache = PredictionCache(directory=None)
+    model = StubModel()
+
+    def stream():
+        yield 'Winner '
+        release.wait(5)
+        yield 'for prompt'
+
+    chunks = cache.stream_or_wait('key', stream, model)
+    assert next(chunks) == 'Winner '
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(list(cache.stream_or_wait('key', stream, model))))
+    waiter.start()
+    while cache.stats()['coalesced'] < 1:
+        time.sleep(0.01)
+    release.set()
+    assert list(chunks) == ['for prompt']
+    waiter.join(5)
+
+    assert results == [['Winner for prompt']]
+    assert model.calls == 0
+    assert list(cache.stream_or_wait('key', stream, model)) == ['Winner for prompt']
+
+
+def test_waiters_call_the_model_when_the_stream_is_abandoned():
+    cache = PredictionCache(directory=None)
+    chunks = cache.stream_or_wait('key', lambda: iter(['Winner ', 'for prompt']), StubModel())
+    assert next(chunks) == 'Winner '
+    chunks.close()
+    assert cache.stats()['in_flight'] == 0 and cache.get('key') is None
+    assert cache.get_or_compute('key', StubModel()) == 'Winner for prompt'
@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+from team_index import TeamIndex
+
+
+# stats.nba.com and ESPN call the Clippers "LA Clippers"; the form uses TEAM_ABBREVIATIONS' name
+def make_index():
+    team_stats = pd.DataFrame({'TEAM_ID': [1610612746, 1610612743], 'TEAM_NAME': ['LA Clippers', 'Denver Nuggets'],
+                               'W': [50, 60]})
+    player_stats = pd.DataFrame({'TEAM_ABBREVIATION': ['LAC', 'LAC', 'DEN'],
+                                 'PLAYER_NAME': ['James Harden', 'Ivica Zubac', 'Nikola Jokic'], 'PTS': [22.0, 16.0, 29.0]})
+    injuries = pd.DataFrame({'Team': ['LA Clippers'], 'Player': ['Seth Lundy'], 'Status': ['Out']})
+    return TeamIndex(team_stats, player_stats, injuries)
+
+
+@pytest.mark.parametrize('team', ['Los Angeles Clippers', 'LAC', 'lac', '1610612746', 'LA Clippers'])
+def test_every_form_of_a_team_reaches_the_same_entry(team):
+    index = make_index()
+    assert index.resolve(team) == 'Los Angeles Clippers'
+    assert index.team_stats(team)['W'] == 50
+    assert [player['PLAYER_NAME'] for player in index.top_players(team)] == ['James Harden', 'Ivica Zubac']
+    assert [injury['Player'] for injury in index.injuries(team)] == ['Seth Lundy']
+
+
+def test_unknown_team_is_rejected():
+    with pytest.raises(ValueError):
+        make_index().resolve('Seattle SuperSonics')
@@ -0,0 +1,58 @@
+import re
+import unicodedata
+from team_index import TEAM_ABBREVIATIONS
+
+
+# Lower-case and strip accents so "Jokić" in the roster matches "Jokic" in a tweet
+def fold(text):
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+# Finds every team and player mentioned in a text with one compiled regex.
+# The alternation is built once per snapshot from the full team names and the
+# whole roster, longest names first so "Jalen Williams" wins over shorter overlaps.
+class TweetMatcher:
+    def __init__(self, team_index):
+        self._targets = {}
+        for team in TEAM_ABBREVIATIONS:
+            self._add(team, team, None)
+            for player in team_index.player_names(team):
+                self._add(player, team, player)
+        alternation = '|'.join(re.escape(keyword) for keyword in sorted(self._targets, key=len, reverse=True))
+        self._pattern = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)") if self._targets else None
+
+    def _add(self, keyword, team, player):
+        teams, players = self._targets.setdefault(fold(keyword), (set(), set()))
+        teams.add(team)
+        if player is not None:
+            players.add(player)
+
+    # Teams and players mentioned in `text`, as two sets
+    def match(self, text):
+        teams, players = set(), set()
+        if self._pattern is None:
+            return teams, players
+        for keyword in set(self._pattern.findall(fold(text))):
+            keyword_teams, keyword_players = self._targets[keyword]
+            teams |= keyword_teams
+            players |= keyword_players
+        return teams, players
+
+
+# Tweets tagged with the teams and players they mention, indexed by team
+class TweetIndex:
+    def __init__(self, tweets, matcher):
+        self.tweets = tweets.to_dict('records')
+        self.tags = []
+        self._by_team = {}
+        for position, tweet in enumerate(self.tweets):
+            teams, players = matcher.match(tweet['Tweet'])
+            self.tags.append({'teams': teams, 'players': players})
+            for team in teams:
+                self._by_team.setdefault(team, []).append(position)
+
+    # Tweets mentioning any of the given teams (or their players), in file order
+    def for_teams(self, *teams):
+        positions = sorted({position for team in teams for position in self._by_team.get(team, [])})
+        return [self.tweets[position] for position in positions]